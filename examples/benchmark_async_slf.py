@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+##############################################################################
+#
+# This file is part of JA2 Open Toolset
+#
+# JA2 Open Toolset is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# JA2 Open Toolset is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with JA2 Open Toolset.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from ja2py.fileformats import SlfFS, AsyncSlfFS
+
+
+def benchmark_sync(slf_fs, paths):
+    start = time.perf_counter()
+    for path in paths:
+        with slf_fs.open(path, 'rb') as f:
+            f.read()
+    return len(paths) / (time.perf_counter() - start)
+
+
+def benchmark_async(async_fs, paths, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request(path):
+        async with semaphore:
+            await async_fs.read(path)
+
+    async def requests():
+        await asyncio.gather(*(request(path) for path in paths))
+
+    start = time.perf_counter()
+    asyncio.get_event_loop().run_until_complete(requests())
+    return len(paths) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare requests per second of SlfFS and AsyncSlfFS reads')
+    parser.add_argument('slf_file', help="path to the SLF file")
+    parser.add_argument('-n', '--requests', type=int, default=10000, help="number of files to read")
+    parser.add_argument('-c', '--concurrency', type=int, default=64, help="number of concurrent async requests")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="number of threads reading for AsyncSlfFS")
+    parser.add_argument('--mmap', action='store_true', default=False, help="memory map the SLF file")
+    args = parser.parse_args()
+
+    slf_fs = SlfFS(args.slf_file, mmap=args.mmap)
+    files = list(slf_fs.walkfiles('/'))
+    if not files:
+        print("Error: '{}' contains no files".format(args.slf_file), file=sys.stderr)
+        exit(1)
+    paths = list(random.choice(files) for _ in range(args.requests))
+
+    print("Sync:  {:10.0f} requests/s".format(benchmark_sync(slf_fs, paths)))
+    with AsyncSlfFS(slf_fs, max_workers=args.workers) as async_fs:
+        print("Async: {:10.0f} requests/s (concurrency {})".format(
+            benchmark_async(async_fs, paths, args.concurrency), args.concurrency))
+    slf_fs.close()
+
+
+if __name__ == "__main__":
+    main()
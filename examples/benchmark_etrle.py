@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+##############################################################################
+#
+# This file is part of JA2 Open Toolset
+#
+# JA2 Open Toolset is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# JA2 Open Toolset is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with JA2 Open Toolset.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+
+import argparse
+import io
+import os
+import random
+import struct
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from ja2py.fileformats import SlfFS, EtrleException, etrle_compress, etrle_decompress
+from ja2py.fileformats.Sti import StiHeader, Sti8BitHeader, StiSubImageHeader
+
+
+def etrle_decompress_bytewise(data):
+    """The byte by byte implementation of etrle_decompress, for comparison"""
+    compressed_bytes = struct.unpack('<{}B'.format(len(data)), data)
+    extracted_buffer = io.BytesIO()
+    bytes_til_next_control_byte = 0
+
+    for current_byte in compressed_bytes:
+        if bytes_til_next_control_byte == 0:
+            length_of_subsequence = current_byte & 0x7F
+            if current_byte & 0x80:
+                for s in range(length_of_subsequence):
+                    extracted_buffer.write(struct.pack('<B', 0))
+            else:
+                bytes_til_next_control_byte = length_of_subsequence
+        else:
+            extracted_buffer.write(struct.pack('<B', current_byte))
+            bytes_til_next_control_byte -= 1
+
+    if bytes_til_next_control_byte != 0:
+        raise EtrleException('Not enough data to decompress')
+
+    return extracted_buffer.getvalue()
+
+
+def etrle_compress_bytewise(data):
+    """The byte by byte implementation of etrle_compress, for comparison"""
+    current = 0
+    source_length = len(data)
+    compressed_buffer = io.BytesIO()
+
+    while current < source_length:
+        runtime_length = 0
+        if data[current] == 0:
+            while current + runtime_length < source_length and data[current + runtime_length] == 0 and \
+                    runtime_length < 0x7F:
+                runtime_length += 1
+            compressed_buffer.write(struct.pack('<B', runtime_length | 0x80))
+        else:
+            while current + runtime_length < source_length and data[current + runtime_length] != 0 and \
+                    runtime_length < 0x7F:
+                runtime_length += 1
+            compressed_buffer.write(struct.pack('<B', runtime_length))
+            compressed_buffer.write(struct.pack('<{}B'.format(runtime_length), *data[current:current+runtime_length]))
+        current += runtime_length
+
+    return compressed_buffer.getvalue()
+
+
+def get_generated_sub_images(number_of_images, width, height):
+    """Compresses sprites with random runs of transparent and opaque pixels"""
+    sub_images = []
+    for _ in range(number_of_images):
+        compressed = io.BytesIO()
+        for _ in range(height):
+            row = bytearray()
+            while len(row) < width:
+                length = min(random.randint(1, 40), width - len(row))
+                row += bytes(length) if random.random() < 0.4 else bytes(random.randint(1, 255) for _ in range(length))
+            compressed.write(etrle_compress(row))
+            compressed.write(b'\x00')
+        sub_images.append(compressed.getvalue())
+    return sub_images
+
+
+def get_slf_sub_images(slf_file):
+    """Collects the compressed sub images of all 8bit ETRLE STI files in an SLF file"""
+    sub_images = []
+    with SlfFS(slf_file) as slf_fs:
+        for path, data in slf_fs.iter_members(p for p in slf_fs.walkfiles('/') if p.lower().endswith('.sti')):
+            header = StiHeader.from_bytes(data[:StiHeader.get_size()])
+            if header['file_identifier'] != b'STCI' or not header.get_flag('flags', 'ETRLE'):
+                continue
+            header_8bit = Sti8BitHeader.from_bytes(header['format_specific_header'])
+            offset = StiHeader.get_size() + 3 * header_8bit['number_of_palette_colors']
+            sub_image_headers = []
+            for _ in range(header_8bit['number_of_images']):
+                sub_image_headers.append(StiSubImageHeader.from_bytes(
+                    data[offset:offset + StiSubImageHeader.get_size()]))
+                offset += StiSubImageHeader.get_size()
+            for sub_image_header in sub_image_headers:
+                sub_images.append(data[offset:offset + sub_image_header['length']])
+                offset += sub_image_header['length']
+    return sub_images
+
+
+def split_etrle_rows(data):
+    """Yields the decompressed rows of an ETRLE compressed image"""
+    row = bytearray()
+    current = 0
+    while current < len(data):
+        control_byte = data[current]
+        current += 1
+        if control_byte == 0:
+            yield bytes(row)
+            row = bytearray()
+        elif control_byte & 0x80:
+            row += bytes(control_byte & 0x7F)
+        else:
+            row += data[current:current + control_byte]
+            current += control_byte
+
+
+def benchmark(function, data_list):
+    """Returns the throughput of `function` in MiB/s of uncompressed data"""
+    start = time.perf_counter()
+    size = 0
+    for data in data_list:
+        size += len(function(data))
+    return size / (time.perf_counter() - start) / 1024 / 1024
+
+
+def benchmark_compress(function, rows):
+    start = time.perf_counter()
+    for row in rows:
+        function(row)
+    return sum(len(row) for row in rows) / (time.perf_counter() - start) / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the ETRLE (de)compressor with a byte by byte implementation')
+    parser.add_argument('slf_file', nargs='?', help="SLF file with STI files to decompress, e.g. Anims.slf")
+    parser.add_argument('-n', '--images', type=int, default=200, help="number of generated images without SLF file")
+    args = parser.parse_args()
+
+    if args.slf_file:
+        sub_images = get_slf_sub_images(args.slf_file)
+    else:
+        sub_images = get_generated_sub_images(args.images, 128, 128)
+    if not sub_images:
+        print("Error: '{}' contains no ETRLE compressed images".format(args.slf_file), file=sys.stderr)
+        exit(1)
+
+    # Images are compressed row by row, the rows are separated by zero length control bytes
+    rows = list(row for data in sub_images for row in split_etrle_rows(data))
+
+    for data in sub_images:
+        if etrle_decompress(data) != etrle_decompress_bytewise(data):
+            print("Error: decompressed images differ", file=sys.stderr)
+            exit(1)
+    for row in rows:
+        if etrle_compress(row) != etrle_compress_bytewise(row):
+            print("Error: compressed rows differ", file=sys.stderr)
+            exit(1)
+
+    print("Decompress byte by byte: {:8.1f} MiB/s".format(benchmark(etrle_decompress_bytewise, sub_images)))
+    print("Decompress current:      {:8.1f} MiB/s".format(benchmark(etrle_decompress, sub_images)))
+    print("Compress byte by byte:   {:8.1f} MiB/s".format(benchmark_compress(etrle_compress_bytewise, rows)))
+    print("Compress current:        {:8.1f} MiB/s".format(benchmark_compress(etrle_compress, rows)))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,7 @@ import difflib
 import glob
 import os
 import re
-from ja2py.fileformats import SlfFS
+from ja2py.fileformats import DataFS, SlfFS
 
 
 # taken from src/game/Directories.h:
@@ -79,24 +79,11 @@ def find_case_insensitive(name, path):
             return os.path.join(path, item)
     return None
 
-def find_local_file(name, dirname, data_path):
-    """Try to find a local file named name in dirname inside data_path.
-    Both name and dirname are case-insensitive.
-
-    Return success."""
-    dirname_found = find_case_insensitive(dirname, data_path)
-    if dirname_found is None:
-        return False
-
-    file_found = find_case_insensitive(name, dirname_found)
-    #if not file_found is None:
-        #print("Found local file {}.".format(file_found))
-    return not file_found is None
-
-def check_resource_file(resources, archive_name, data_path, sequence_match_ratio_threshold = 0.75):
+def check_resource_file(resources, archive_name, data_path, data_fs, sequence_match_ratio_threshold = 0.75):
     """Check if a list of resources can be found.
 
     resources is expected to be a tuple returned by aggregate_resource_list(...).
+    data_fs is a case-insensitive DataFS of data_path, used to find local files.
 
     Strategy:
     1. Search archive named archive_name inside data_path.
@@ -111,25 +98,24 @@ def check_resource_file(resources, archive_name, data_path, sequence_match_ratio
     if path is None:
         print("Archive '{}' not found.".format(archive_name))
         for resource_dirname, resource, location in resources:
-            ret = find_local_file(resource[1:], resource_dirname, data_path)
-            if not ret:
+            if not data_fs.isfile(resource_dirname + resource):
                 print(location)
                 print("  File '{}{}' not found.".format(resource_dirname, resource))
                 print()
         return
     print("Using archive '{}'.".format(path))
 
-    slf_fs = SlfFS(path)
+    slf_fs = SlfFS(path, case_insensitive=True)
     not_in_slf = []
     for resource_dirname, resource, location in resources:
         #resource = resource[1:].upper()
 
         # Search archive:
-        found = slf_fs.isfile(resource[1:].upper())
+        found = slf_fs.isfile(resource[1:])
 
         # Search local file:
         if not found:
-            found = find_local_file(resource[1:], resource_dirname, data_path)
+            found = data_fs.isfile(resource_dirname + resource)
 
         if not found:
             not_in_slf.append((resource_dirname, resource, location))
@@ -174,11 +160,13 @@ def main():
         return
     path_data = sys.argv[1]
     path_src = sys.argv[2]
+    # Indexes the local files once, instead of listing directories for every resource
+    data_fs = DataFS(path_data, case_insensitive=True)
 
     for key, val in RESOURCES.items():
         filelist = aggregate_resource_list(path_src, key, val)
         archive_name = "{}.slf".format(val)
-        check_resource_file(filelist, archive_name, path_data)
+        check_resource_file(filelist, archive_name, path_data, data_fs)
         print()
         print()
 
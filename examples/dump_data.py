@@ -24,35 +24,29 @@ import os
 import sys
 import glob
 import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 
 sys.path.append(os.getcwd())
 
-from ja2py.fileformats import SlfFS, Sti, is_8bit_sti, is_16bit_sti, load_8bit_sti, load_16bit_sti, load_gap
+from ja2py.fileformats import SlfFS, extract_slf, Sti, is_8bit_sti, is_16bit_sti, load_8bit_sti, load_16bit_sti, load_gap
 from sti_to_png import write_8bit_png_from_sti, write_24bit_png_from_sti
 
 
-def dump_file(output_folder, file_path, slf_fs, args):
-    to_path = os.path.join(output_folder, file_path[1:])
-    to_dir = os.path.dirname(to_path)
-    if args.verbose:
-        print("Dumping raw file: {}".format(file_path))
-
-    if not os.path.exists(to_dir):
-        os.makedirs(to_dir)
-    with slf_fs.open(file_path, 'rb') as from_file, open(to_path, 'wb') as to_file:
-        to_file.write(from_file.read())
+# Maximum number of files read ahead of the conversions
+MAX_PENDING_FILES = 256
 
 
-def dump_sti(output_folder, file_path, slf_fs, args):
+def dump_sti(output_folder, file_path, data, args):
     png_file_path = os.path.splitext(file_path)[0] + '.png'
     to_path = os.path.join(output_folder, png_file_path[1:])
     to_dir = os.path.dirname(to_path)
     if args.verbose:
         print("Dumping PNGs from STI file: {}".format(file_path))
 
-    with slf_fs.open(file_path, 'rb') as file:
-        if not os.path.exists(to_dir):
-            os.makedirs(to_dir)
+    with BytesIO(data) as file:
+        os.makedirs(to_dir, exist_ok=True)
         if is_8bit_sti(file):
             sti = load_8bit_sti(file)
             to_path = os.path.splitext(to_path)[0] + '.STI' if len(sti.images) > 1 else os.path.splitext(to_path)[0] + '.png'
@@ -62,42 +56,51 @@ def dump_sti(output_folder, file_path, slf_fs, args):
             write_24bit_png_from_sti(to_path, sti, verbose=args.verbose)
 
 
-def dump_gap(output_folder, file_path, slf_fs, args):
+def dump_gap(output_folder, file_path, data, args):
     json_file_path = os.path.splitext(file_path)[0] + '.gap.json'
     to_path = os.path.join(output_folder, json_file_path[1:])
     to_dir = os.path.dirname(to_path)
     if args.verbose:
         print("Dumping JSON from GAP file: {}".format(file_path))
-    if not os.path.exists(to_dir):
-        os.makedirs(to_dir)
+    os.makedirs(to_dir, exist_ok=True)
 
-    with slf_fs.open(file_path, 'rb') as from_file, open(to_path, 'w', encoding='utf8') as to_file:
+    with BytesIO(data) as from_file, open(to_path, 'w', encoding='utf8') as to_file:
         gap_list = load_gap(from_file)
         json.dump(gap_list, to_file, indent=2)
 
 
-def dump_directory(output_folder, slf_fs, directory, args):
+def dump_slf(output_folder, slf_fs, executor, args):
     special_file_handlers = {
         '.sti': dump_sti,
         '.gap': dump_gap
     }
 
-    for file in slf_fs.listdir(directory, files_only=True):
-        extension = os.path.splitext(file)[1].lower()
-        slf_folder = os.path.splitext(os.path.basename(slf_fs.file_name))[0]
-        args_to_dump = (
-            os.path.join(output_folder, slf_folder),
-            os.path.join(directory, file),
-            slf_fs,
-            args
-        )
-
-        if extension in special_file_handlers:
-            special_file_handlers[extension](*args_to_dump)
-        else:
-            dump_file(*args_to_dump)
-    for dir in slf_fs.listdir(directory, dirs_only=True):
-        dump_directory(output_folder, slf_fs, os.path.join(directory, dir), args)
+    slf_folder = os.path.join(output_folder, os.path.splitext(os.path.basename(slf_fs.file_name))[0])
+    raw_files = []
+    special_files = []
+    for directory, files in slf_fs.walk('/'):
+        for file in files:
+            file_path = os.path.join(directory, file)
+            extension = os.path.splitext(file)[1].lower()
+            if extension in special_file_handlers:
+                special_files.append(file_path)
+            else:
+                if args.verbose:
+                    print("Dumping raw file: {}".format(file_path))
+                raw_files.append(file_path)
+
+    extract_slf(slf_fs, slf_folder, jobs=args.jobs, paths=raw_files)
+
+    # Files are read in the order they are stored and converted in parallel
+    pending = deque()
+    for file_path, data in slf_fs.iter_members(special_files):
+        extension = os.path.splitext(file_path)[1].lower()
+        pending.append(executor.submit(special_file_handlers[extension], slf_folder, file_path, data, args))
+        if len(pending) > MAX_PENDING_FILES:
+            pending.popleft().result()
+    for future in pending:
+        future.result()
+
 
 def main():
     parser = argparse.ArgumentParser(description='Jagged Alliance 2 Data Dump')
@@ -108,6 +111,18 @@ def main():
         default=None,
         help="folder for extracted files.  By default, files extracted alongside the slf file in a subdirector called Dump."
     )
+    parser.add_argument(
+        '--index-cache',
+        default=None,
+        help="folder to cache the parsed SLF entry tables in, speeds up subsequent runs"
+    )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of files to dump in parallel.  By default one per CPU"
+    )
     parser.add_argument(
         '-v',
         '--verbose',
@@ -131,11 +146,12 @@ def main():
     if args.verbose:
         print("Dumping Files matching {} to {}".format(globbing_path, output_folder))
 
-    for slf_path in glob.iglob(globbing_path):
-        if args.verbose:
-            print("Loading SLF file {0}".format(slf_path))
-        slf_fs = SlfFS(slf_path)
-        dump_directory(output_folder, slf_fs, '/', args)
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        for slf_path in glob.iglob(globbing_path):
+            if args.verbose:
+                print("Loading SLF file {0}".format(slf_path))
+            with SlfFS(slf_path, index_cache=args.index_cache) as slf_fs:
+                dump_slf(output_folder, slf_fs, executor, args)
 
 
 if __name__ == "__main__":
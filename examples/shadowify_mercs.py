@@ -69,7 +69,7 @@ def main():
                 b.copy('/10.STI', f)
 
     with open(output_file, 'wb+') as f:
-        b.save(f)
+        b.save(f, deduplicate=True)
 
 if __name__ == "__main__":
     main()
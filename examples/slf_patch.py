@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+##############################################################################
+#
+# This file is part of JA2 Open Toolset
+#
+# JA2 Open Toolset is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# JA2 Open Toolset is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with JA2 Open Toolset.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+from ja2py.fileformats import SlfFS, SlfPatchException, diff_slf, apply_slf_patch
+
+
+def diff(args):
+    with SlfFS(args.source, mmap=True) as source, SlfFS(args.target, mmap=True) as target:
+        with open(args.patch, 'wb') as patch_file:
+            summary = diff_slf(source, target, patch_file)
+    print("{added} added, {changed} changed, {removed} removed, {unchanged} unchanged".format(**summary))
+
+
+def apply(args):
+    with SlfFS(args.source) as source, open(args.patch, 'rb') as patch_file, open(args.output, 'wb') as output:
+        try:
+            apply_slf_patch(source, patch_file, output)
+        except SlfPatchException as e:
+            print("Error: {}".format(e), file=sys.stderr)
+            exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create and apply patches between SLF files')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    diff_parser = subparsers.add_parser('diff', help="create a patch that turns the source into the target SLF file")
+    diff_parser.add_argument('source', help="path to the original SLF file")
+    diff_parser.add_argument('target', help="path to the changed SLF file")
+    diff_parser.add_argument('patch', help="path to write the patch to")
+    diff_parser.set_defaults(func=diff)
+
+    apply_parser = subparsers.add_parser('apply', help="apply a patch to the source SLF file")
+    apply_parser.add_argument('source', help="path to the original SLF file")
+    apply_parser.add_argument('patch', help="path to the patch")
+    apply_parser.add_argument('output', help="path to write the patched SLF file to")
+    apply_parser.set_defaults(func=apply)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -25,9 +25,7 @@ import sys
 
 sys.path.append(os.getcwd())
 
-from ja2py.fileformats import SlfFS
-from fs.osfs import OSFS
-from fs.mountfs import MountFS
+from ja2py.fileformats import SlfFS, extract_slf
 
 def main():
     parser = argparse.ArgumentParser(description='SLF Unpacker')
@@ -38,6 +36,13 @@ def main():
         default=None,
         help="folder for extracted files.  By default, files extracted alongside the slf file in a subdirectory.  For example, content of foo/bar/maps.slf is extracted into folder foo/bar/maps"
     )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=None,
+        help="number of files to write in parallel.  By default one per CPU"
+    )
     parser.add_argument(
         '-v',
         '--verbose',
@@ -70,16 +75,13 @@ def main():
         print("Output folder: {}".format(output_folder))
 
     slf_fs = SlfFS(slf_file)
-    out_fs = OSFS(output_folder)
 
     if args.verbose:
         print("Extracting Files:")
         slf_fs.printtree()
 
-    combined_fs = MountFS()
-    combined_fs.mountdir('slf', slf_fs)
-    combined_fs.mountdir('out', out_fs)
-    combined_fs.copydir('/slf', '/out', overwrite=True)
+    extract_slf(slf_fs, output_folder, jobs=args.jobs)
+    slf_fs.close()
 
     if args.verbose:
         print("Done")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+##############################################################################
+#
+# This file is part of JA2 Open Toolset
+#
+# JA2 Open Toolset is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# JA2 Open Toolset is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with JA2 Open Toolset.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from ja2py.fileformats import verify_slf
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify SLF files, exits with status 1 if there are problems')
+    parser.add_argument('paths', nargs='+', help="paths to SLF files or directories containing SLF files")
+    parser.add_argument(
+        '-d',
+        '--decode',
+        action='store_true',
+        default=False,
+        help="decode all STI and GAP files as well"
+    )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=None,
+        help="number of processes decoding files.  By default one per CPU"
+    )
+    args = parser.parse_args()
+
+    slf_files = []
+    for path in args.paths:
+        path = os.path.normpath(os.path.abspath(os.path.expanduser(os.path.expandvars(path))))
+        if os.path.isdir(path):
+            slf_files.extend(sorted(f for f in glob.iglob(os.path.join(path, '*')) if f.lower().endswith('.slf')))
+        else:
+            slf_files.append(path)
+
+    number_of_problems = 0
+    for slf_file in slf_files:
+        start = time.perf_counter()
+        verification = verify_slf(slf_file, decode=args.decode, jobs=args.jobs)
+        duration = time.perf_counter() - start
+
+        status = "OK" if not verification.problems else "{} problems".format(len(verification.problems))
+        if args.decode:
+            print("{}: {}, decoded {} files ({:.1f} MB/s)".format(
+                slf_file, status, verification.number_of_decoded,
+                verification.decoded_size / max(duration, 1e-9) / 1024 / 1024))
+        else:
+            print("{}: {}".format(slf_file, status))
+        for problem in verification.problems:
+            print("  {}: {}".format(problem.file_name or 'header', problem.message))
+        number_of_problems += len(verification.problems)
+
+    exit(1 if number_of_problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+##############################################################################
+#
+# This file is part of JA2 Open Toolset
+#
+# JA2 Open Toolset is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# JA2 Open Toolset is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with JA2 Open Toolset.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from fs.errors import ResourceInvalidError, ResourceNotFoundError
+
+from .SlfFS import SlfFS
+
+
+class _AsyncPathIterator(object):
+    """Asynchronous iterator over a list of paths, async generators need Python 3.6"""
+
+    def __init__(self, paths):
+        self._paths = iter(paths)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._paths)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncSlfFS(object):
+    """
+    Implements asyncio reads on top of a SlfFS
+
+    Reads run in a bounded pool of `max_workers` threads, so they do not block the event loop. SLF-files opened by
+    filename are read with positional reads (or through the mapping with `mmap=True`), so concurrent reads of the same
+    SLF-file run in parallel.
+
+    `slf_fs` is a SlfFS or the name of an SLF-file, which is then opened and closed by the AsyncSlfFS.
+    Iterating over an AsyncSlfFS with `async for` yields the paths of all files in the order they are stored.
+    """
+
+    def __init__(self, slf_fs, max_workers=None, mmap=False):
+        self._owns_slf_fs = not isinstance(slf_fs, SlfFS)
+        self.slf_fs = SlfFS(slf_fs, mmap=mmap) if self._owns_slf_fs else slf_fs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _get_entry_index(self, path):
+        index = self.slf_fs._get_entry_index(path)
+        if index is None:
+            if self.slf_fs.isdir(path):
+                raise ResourceInvalidError(path)
+            raise ResourceNotFoundError(path)
+        return index
+
+    def _read_bytes(self, offset, length):
+        data = self.slf_fs._read(offset, length)
+        return data if isinstance(data, bytes) else bytes(data)
+
+    async def read(self, path):
+        """Returns the contents of a file"""
+        index = self._get_entry_index(path)
+        entry_table = self.slf_fs.entry_table
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, self._read_bytes, entry_table.offsets[index],
+                                          entry_table.lengths[index])
+
+    async def read_many(self, paths):
+        """Returns the contents of multiple files in the order of `paths`, the files are read concurrently"""
+        return await asyncio.gather(*(self.read(path) for path in paths))
+
+    def __aiter__(self):
+        offsets = self.slf_fs.entry_table.offsets
+        paths = sorted(self.slf_fs._entries_by_path.items(), key=lambda p: offsets[p[1]])
+        return _AsyncPathIterator(path for path, _ in paths)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        if self._owns_slf_fs:
+            self.slf_fs.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        # Waiting for running reads would block the event loop
+        await asyncio.get_event_loop().run_in_executor(None, self.close)
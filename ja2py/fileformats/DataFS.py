@@ -0,0 +1,264 @@
+##############################################################################
+#
+# This file is part of JA2 Open Toolset
+#
+# JA2 Open Toolset is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# JA2 Open Toolset is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with JA2 Open Toolset.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+import os
+import io
+from datetime import datetime
+from fs.base import FS
+from fs.errors import CreateFailedError, UnsupportedError, ResourceNotFoundError, ResourceInvalidError
+from fs.path import pathsplit
+
+from .SlfFS import SlfFS, _get_lookup_path, _get_folded_path
+
+WRITING_NOT_SUPPORTED_ERROR = 'Writing to a data directory is not supported. Operation. {}'
+
+# Within one directory loose files take precedence over files in archives
+_ARCHIVE_PRIORITY = 0
+_LOOSE_FILE_PRIORITY = 1
+
+
+def _get_mount_path(path):
+    end = path.find('/', 1)
+    return path if end == -1 else path[:end]
+
+
+class DataFS(FS):
+    """
+    Implements a read-only file system on top of a JA2 data directory
+
+    Every SLF-file in the data directory is mounted at its name without extension (e.g. Interface.slf at
+    /Interface), loose files in the data directory take precedence over files in the archives.
+    Mod directories are layered on top of the data directory in the given order, each with its own archives and loose
+    files. Later mod directories take precedence over earlier ones.
+
+    Loose files are indexed up front, archives are opened on first access to their mount path. Their files are then
+    merged into the same index, so every lookup is a single dictionary access.
+
+    With `case_insensitive` paths are resolved regardless of their case, like the game does. Files and directories
+    that only differ in case are merged and shadow each other, the first spelling seen is the one that is listed.
+    """
+
+    _meta = {
+        'thread_safe': False,
+        'virtual': False,
+        'read_only': True,
+        'unicode_paths': True,
+        'case_insensitive_paths': False,
+        'network': False,
+        'atomic.setcontents': False
+    }
+
+    def __init__(self, data_directory, mod_directories=(), mmap=False, index_cache=None, case_insensitive=False):
+        super(DataFS, self).__init__()
+
+        self._slf_options = {'mmap': mmap, 'index_cache': index_cache}
+        # path -> (priority, SlfFS or None for loose files, path in the SlfFS or system path)
+        self._files = {}
+        self._directories = {'/'}
+        # mount path -> [(priority, SLF-file name)]
+        self._mounts = {}
+        self._archives = []
+        self._directory_contents = None
+        # Case folded paths map to the path in the index
+        self._folded_paths = None
+        if case_insensitive:
+            self._meta = dict(self._meta, case_insensitive_paths=True)
+            self._folded_paths = {'/': '/'}
+
+        directories = [data_directory] + list(mod_directories)
+        for layer, directory in enumerate(directories):
+            directory = os.path.expanduser(os.path.expandvars(directory))
+            directory = os.path.normpath(os.path.abspath(directory))
+            if not os.path.isdir(directory):
+                raise CreateFailedError('Data directory not found ({0})'.format(directory))
+            self._index_directory(directory, layer)
+
+    def _index_directory(self, directory, layer):
+        for system_path, directory_names, file_names in os.walk(directory):
+            relative_path = os.path.relpath(system_path, directory)
+            path = '/' if relative_path == os.curdir else '/' + '/'.join(relative_path.split(os.sep))
+            path = self._add_directory(path)
+            for file_name in file_names:
+                system_file_name = os.path.join(system_path, file_name)
+                if path == '/' and os.path.splitext(file_name)[1].lower() == '.slf':
+                    mount_path = self._add_directory('/' + os.path.splitext(file_name)[0])
+                    self._mounts.setdefault(mount_path, []).append(((layer, _ARCHIVE_PRIORITY), system_file_name))
+                else:
+                    self._add_file(_get_lookup_path(path + '/' + file_name),
+                                   ((layer, _LOOSE_FILE_PRIORITY), None, system_file_name))
+
+    def _resolve_path(self, path):
+        if self._folded_paths is not None:
+            return self._folded_paths.get(_get_folded_path(path), path)
+        return path
+
+    def _get_indexed_path(self, path):
+        """Returns the path under which path is indexed, which differs from it only in case"""
+        if self._folded_paths is None or path == '/':
+            return path
+        indexed_path = self._folded_paths.get(_get_folded_path(path))
+        if indexed_path is not None:
+            return indexed_path
+        directory, name = pathsplit(path)
+        directory = self._get_indexed_path(directory)
+        return (directory if directory == '/' else directory + '/') + name
+
+    def _add_directory(self, path):
+        path = self._get_indexed_path(path)
+        self._directories.add(path)
+        if self._folded_paths is not None:
+            self._folded_paths.setdefault(_get_folded_path(path), path)
+        return path
+
+    def _add_file(self, path, source):
+        """Adds a file to the index if it is not shadowed, returns the path it was added at or None"""
+        path = self._get_indexed_path(path)
+        existing = self._files.get(path)
+        if existing is None or existing[0] < source[0]:
+            self._files[path] = source
+            if self._folded_paths is not None:
+                self._folded_paths.setdefault(_get_folded_path(path), path)
+            return path
+        return None
+
+    def _mount(self, path):
+        """Opens the archives mounted at the first component of path and merges their files into the index"""
+        mount_path = _get_mount_path(path)
+        if mount_path not in self._mounts:
+            return
+        with self._lock:
+            archives = self._mounts.pop(mount_path, [])
+            for priority, slf_filename in archives:
+                slf_fs = SlfFS(slf_filename, **self._slf_options)
+                self._archives.append(slf_fs)
+                # Parent directories are added before their contents, so their spelling is used for the contents
+                added_directories = set(self._add_directory(mount_path + d)
+                                        for d in sorted(slf_fs._directories, key=len) if d != '/')
+                added_paths = []
+                for slf_path in slf_fs._entries_by_path:
+                    added_path = self._add_file(mount_path + slf_path, (priority, slf_fs, slf_path))
+                    if added_path is not None:
+                        added_paths.append(added_path)
+                if self._directory_contents is not None:
+                    self._add_to_directory_contents(added_directories)
+                    self._add_to_directory_contents(added_paths)
+
+    def _get_source(self, path):
+        return self._files.get(self._get_mounted_path(path))
+
+    def _get_mounted_path(self, path):
+        """Returns the indexed path for path after mounting the archives it could be in"""
+        path = _get_lookup_path(path)
+        if self._mounts:
+            self._mount(self._resolve_path(_get_mount_path(path)))
+        return self._resolve_path(path)
+
+    def _get_directory_contents(self):
+        if self._directory_contents is None:
+            self._directory_contents = dict((d, set()) for d in self._directories)
+            self._add_to_directory_contents(self._directories)
+            self._add_to_directory_contents(self._files)
+        return self._directory_contents
+
+    def _add_to_directory_contents(self, paths):
+        for path in paths:
+            if path != '/':
+                directory, name = pathsplit(path)
+                self._directory_contents.setdefault(directory, set()).add(name)
+
+    def __str__(self):
+        return '<DataFS: {0}>'.format(', '.join(sorted(self._mounts)))
+
+    def close(self):
+        for slf_fs in self._archives:
+            slf_fs.close()
+        self._archives = []
+        super(DataFS, self).close()
+
+    def exists(self, path):
+        return self._get_source(path) is not None or self.isdir(path)
+
+    def isfile(self, path):
+        return self._get_source(path) is not None
+
+    def isdir(self, path):
+        return self._get_mounted_path(path) in self._directories
+
+    def listdir(self, path="/", wildcard=None, full=False, absolute=False, dirs_only=False, files_only=False):
+        lookup_path = self._get_mounted_path(path)
+        if lookup_path not in self._directories:
+            if lookup_path in self._files:
+                raise ResourceInvalidError(path, msg="Can't list a file: %(path)s")
+            raise ResourceNotFoundError(path)
+        names = sorted(self._get_directory_contents()[lookup_path])
+        return self._listdir_helper(path, names, wildcard, full, absolute, dirs_only, files_only)
+
+    def open(self, path, mode='r', buffering=-1, encoding='ascii', errors=None, newline=None, line_buffering=False, **kwargs):
+        if mode != 'r' and mode != 'rb':
+            raise UnsupportedError(WRITING_NOT_SUPPORTED_ERROR.format('open'))
+        source = self._get_source(path)
+        if source is None:
+            if self.isdir(path):
+                raise ResourceInvalidError(path)
+            raise ResourceNotFoundError(path)
+
+        _, slf_fs, source_path = source
+        if slf_fs is not None:
+            return slf_fs.open(source_path, mode, encoding=encoding)
+        if mode == 'rb':
+            return io.open(source_path, 'rb')
+        return io.open(source_path, 'r', encoding=encoding, errors=errors, newline=newline)
+
+    def getinfo(self, path):
+        source = self._get_source(path)
+        if source is None:
+            if self.isdir(path):
+                return {
+                    'size': 0
+                }
+            raise ResourceNotFoundError(path)
+
+        _, slf_fs, source_path = source
+        if slf_fs is not None:
+            return slf_fs.getinfo(source_path)
+        stat = os.stat(source_path)
+        return {
+            'size': stat.st_size,
+            'modified_time': datetime.fromtimestamp(stat.st_mtime)
+        }
+
+    def getsyspath(self, path, allow_none=False):
+        source = self._get_source(path)
+        if source is not None and source[1] is None:
+            return source[2]
+        if allow_none:
+            return None
+        raise ResourceNotFoundError(path, msg="Path does not map to a loose file: %(path)s")
+
+    def makedir(self, path, recursive=False, allow_recreate=False):
+        raise UnsupportedError(WRITING_NOT_SUPPORTED_ERROR.format('makedir'))
+
+    def remove(self, path):
+        raise UnsupportedError(WRITING_NOT_SUPPORTED_ERROR.format('remove'))
+
+    def removedir(self, path, recursive=False, force=False):
+        raise UnsupportedError(WRITING_NOT_SUPPORTED_ERROR.format('removedir'))
+
+    def rename(self, src, dst):
+        raise UnsupportedError(WRITING_NOT_SUPPORTED_ERROR.format('rename'))
@@ -17,13 +17,18 @@
 #
 ##############################################################################
 
-import io
-import struct
+import re
 
 ALPHA_VALUE = 0
 IS_COMPRESSED_BYTE_MASK = 0x80
 NUMBER_OF_BYTES_MASK = 0x7F
 
+# Transparent runs by length, so decompressing does not allocate them
+_ALPHA_RUNS = list(bytes([ALPHA_VALUE]) * n for n in range(NUMBER_OF_BYTES_MASK + 1))
+# Matches a run of ALPHA_VALUE bytes (in a group) or a run of other bytes
+_ALPHA_PATTERN = re.escape(bytes([ALPHA_VALUE]))
+_RUNS_PATTERN = re.compile(b'(' + _ALPHA_PATTERN + b'+)|[^' + _ALPHA_PATTERN + b']+')
+
 
 class EtrleException(Exception):
     """Raised when an error in compression or decompression occurs"""
@@ -31,54 +36,207 @@ class EtrleException(Exception):
 
 
 def etrle_decompress(data):
-    number_of_compressed_bytes = len(data)
-    compressed_bytes = struct.unpack('<{}B'.format(number_of_compressed_bytes), data)
-    extracted_buffer = io.BytesIO()
-    bytes_til_next_control_byte = 0
-
-    for current_byte in compressed_bytes:
-        if bytes_til_next_control_byte == 0:
-            is_compressed_alpha_byte = ((current_byte & IS_COMPRESSED_BYTE_MASK) >> 7) == 1
-            length_of_subsequence = current_byte & NUMBER_OF_BYTES_MASK
-            if is_compressed_alpha_byte:
-                for s in range(length_of_subsequence):
-                    extracted_buffer.write(struct.pack('<B', ALPHA_VALUE))
+    """
+    Decompresses ETRLE data
+
+    Only the control bytes are visited, literal runs are copied as slices and transparent runs are filled with
+    ALPHA_VALUE bytes.
+    """
+    data = memoryview(data).cast('B')
+    data_length = len(data)
+    extracted_buffer = bytearray()
+    current = 0
+
+    while current < data_length:
+        control_byte = data[current]
+        length_of_subsequence = control_byte & NUMBER_OF_BYTES_MASK
+        current += 1
+        if control_byte & IS_COMPRESSED_BYTE_MASK:
+            extracted_buffer += _ALPHA_RUNS[length_of_subsequence]
+        else:
+            if current + length_of_subsequence > data_length:
+                raise EtrleException('Not enough data to decompress')
+            extracted_buffer += data[current:current + length_of_subsequence]
+            current += length_of_subsequence
+
+    return bytes(extracted_buffer)
+
+
+def etrle_decompress_into(data, out, out_offset=0, stride=None, truncate=False):
+    """
+    Decompresses ETRLE data into the writable buffer `out`, returns the number of decompressed bytes
+
+    The data is written starting at `out_offset`. With `stride` every row, which ends with a zero length control byte,
+    is written `stride` bytes after the start of the previous one, so images can be decompressed into a larger
+    canvas. Raises EtrleException if `out` is too small, unless `truncate` is set, then decompression stops at the end
+    of `out`.
+    """
+    data = memoryview(data).cast('B')
+    out = memoryview(out).cast('B')
+    data_length = len(data)
+    out_length = len(out)
+    current = 0
+    written = 0
+    position = row_start = out_offset
+
+    while current < data_length:
+        control_byte = data[current]
+        length_of_subsequence = control_byte & NUMBER_OF_BYTES_MASK
+        current += 1
+        if position + length_of_subsequence > out_length:
+            if not truncate:
+                raise EtrleException('Not enough space to decompress')
+            length_of_subsequence = max(out_length - position, 0)
+            if control_byte & IS_COMPRESSED_BYTE_MASK:
+                run = _ALPHA_RUNS[length_of_subsequence]
             else:
-                bytes_til_next_control_byte = length_of_subsequence
+                run = data[current:current + length_of_subsequence]
+            out[position:position + len(run)] = run
+            return written + len(run)
+        if control_byte & IS_COMPRESSED_BYTE_MASK:
+            out[position:position + length_of_subsequence] = _ALPHA_RUNS[length_of_subsequence]
+        elif control_byte == 0:
+            if stride is not None:
+                row_start += stride
+                position = row_start
+            continue
         else:
-            extracted_buffer.write(struct.pack('<B', current_byte))
-            bytes_til_next_control_byte -= 1
-
-    if bytes_til_next_control_byte != 0:
+            if current + length_of_subsequence > data_length:
+                raise EtrleException('Not enough data to decompress')
+            out[position:position + length_of_subsequence] = data[current:current + length_of_subsequence]
+            current += length_of_subsequence
+        position += length_of_subsequence
+        written += length_of_subsequence
+
+    return written
+
+
+def etrle_row_offsets(data):
+    """
+    Returns the offsets in ETRLE data at which the rows start
+
+    Every row ends with a zero length control byte, only the control bytes are visited to find them. Data after the
+    last of them is counted as a row as well. Raises EtrleException if the data ends within a run.
+    """
+    data = memoryview(data).cast('B')
+    data_length = len(data)
+    row_offsets = []
+    current = row_start = 0
+
+    while current < data_length:
+        control_byte = data[current]
+        current += 1
+        if control_byte == 0:
+            row_offsets.append(row_start)
+            row_start = current
+        elif not control_byte & IS_COMPRESSED_BYTE_MASK:
+            current += control_byte
+
+    if current > data_length:
         raise EtrleException('Not enough data to decompress')
+    if row_start < data_length:
+        row_offsets.append(row_start)
+    return row_offsets
+
+
+def etrle_decompress_rows(data, width, y0, y1, row_offsets=None):
+    """
+    Decompresses the rows `y0` to `y1` (excluding `y1`) of an ETRLE compressed image that is `width` pixels wide
+
+    Only the rows in the range are decompressed. `row_offsets` are the offsets returned by etrle_row_offsets, pass
+    them in when decompressing multiple ranges of the same image.
+    """
+    if row_offsets is None:
+        row_offsets = etrle_row_offsets(data)
+    if not 0 <= y0 <= y1 <= len(row_offsets):
+        raise ValueError('Invalid rows {0} to {1} of {2}'.format(y0, y1, len(row_offsets)))
+    if y0 == y1:
+        return b''
+    end = row_offsets[y1] if y1 < len(row_offsets) else len(data)
+
+    extracted_buffer = bytearray((y1 - y0) * width)
+    written = etrle_decompress_into(memoryview(data)[row_offsets[y0]:end], extracted_buffer, stride=width)
+    if written != len(extracted_buffer):
+        raise EtrleException('Rows do not match the width of {0}'.format(width))
+    return bytes(extracted_buffer)
+
+
+class EtrleDecoder(object):
+    """
+    Incremental ETRLE decompressor
+
+    Compressed data is passed to `decode` in chunks of any size, a run that continues in the next chunk is resumed
+    there. `decode` returns the rows of `width` bytes completed by the chunk, so only the unfinished row is kept
+    between chunks. Without `width` all decompressed bytes are returned.
+    """
+
+    def __init__(self, width=None):
+        self.width = width
+        self._row = bytearray()
+        self._remaining_literal_bytes = 0
+
+    def decode(self, data):
+        """Decompresses the next chunk of data, returns the completed rows as bytes"""
+        data = memoryview(data).cast('B')
+        data_length = len(data)
+        row = self._row
+
+        current = min(self._remaining_literal_bytes, data_length)
+        row += data[:current]
+        self._remaining_literal_bytes -= current
+
+        while current < data_length:
+            control_byte = data[current]
+            length_of_subsequence = control_byte & NUMBER_OF_BYTES_MASK
+            current += 1
+            if control_byte & IS_COMPRESSED_BYTE_MASK:
+                row += _ALPHA_RUNS[length_of_subsequence]
+            else:
+                available = min(length_of_subsequence, data_length - current)
+                row += data[current:current + available]
+                current += available
+                self._remaining_literal_bytes = length_of_subsequence - available
+
+        completed = len(row) if not self.width else len(row) - len(row) % self.width
+        rows = bytes(row[:completed])
+        del row[:completed]
+        return rows
+
+    def flush(self):
+        """
+        Returns the decompressed bytes of an unfinished row after the last chunk, raises EtrleException if the data
+        ended within a run
+        """
+        if self._remaining_literal_bytes != 0:
+            raise EtrleException('Not enough data to decompress')
+        rest = bytes(self._row)
+        del self._row[:]
+        return rest
 
-    return extracted_buffer.getvalue()
 
 def etrle_compress(data):
-    current = 0
-    source_length = len(data)
-    compressed_buffer = io.BytesIO()
-
-    while current < source_length:
-        runtime_length = 0
-
-        if data[current] == 0:
-            while current + runtime_length < source_length and data[current + runtime_length] == 0 and runtime_length < NUMBER_OF_BYTES_MASK:
-                runtime_length += 1
-            compressed_buffer.write(struct.pack('<B', runtime_length | IS_COMPRESSED_BYTE_MASK))
+    """
+    Compresses data with ETRLE
+
+    Runs of ALPHA_VALUE and of other bytes are found with a regular expression, literal runs are copied as slices.
+    """
+    if not isinstance(data, (bytes, bytearray)):
+        data = bytes(data)
+    compressed_buffer = bytearray()
+
+    for run in _RUNS_PATTERN.finditer(data):
+        start, end = run.span()
+        if run.lastindex is not None:
+            while end - start > NUMBER_OF_BYTES_MASK:
+                compressed_buffer.append(NUMBER_OF_BYTES_MASK | IS_COMPRESSED_BYTE_MASK)
+                start += NUMBER_OF_BYTES_MASK
+            compressed_buffer.append((end - start) | IS_COMPRESSED_BYTE_MASK)
         else:
-            while current + runtime_length < source_length and data[current + runtime_length] != 0 and runtime_length < NUMBER_OF_BYTES_MASK:
-                runtime_length += 1
-            compressed_buffer.write(struct.pack('<B', runtime_length))
-            compressed_buffer.write(struct.pack('<{}B'.format(runtime_length), * data[current:current+runtime_length]))
-
-        current += runtime_length
-
-    return compressed_buffer.getvalue()
-
-
-
-
-
-
-
+            while end - start > NUMBER_OF_BYTES_MASK:
+                compressed_buffer.append(NUMBER_OF_BYTES_MASK)
+                compressed_buffer += data[start:start + NUMBER_OF_BYTES_MASK]
+                start += NUMBER_OF_BYTES_MASK
+            compressed_buffer.append(end - start)
+            compressed_buffer += data[start:end]
+
+    return bytes(compressed_buffer)
@@ -18,24 +18,59 @@
 ##############################################################################
 
 import os
+import sys
 import io
+import hashlib
+import itertools
+import shutil
+import struct
+import tempfile
+import threading
+from collections import namedtuple, Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from array import array
+from mmap import mmap as memory_map, ACCESS_READ
 from time import gmtime
 from calendar import timegm
 from datetime import datetime
 from fs.base import FS
-from fs.errors import CreateFailedError, UnsupportedError, ResourceNotFoundError, ResourceInvalidError
+from fs.errors import CreateFailedError, UnsupportedError, ResourceNotFoundError, ResourceInvalidError, \
+                      DirectoryNotEmptyError, RemoveRootError, BackReferenceError
 from fs.memoryfs import MemoryFS
 from fs.multifs import MultiFS
+from fs.path import abspath, normpath, pathsplit
 
 from .common import decode_ja2_string, encode_ja2_string, Ja2FileHeader
 
 DIRECTORY_CONFLICT_SUFFIX = '_DIRECTORY_CONFLICT'
+COPY_CHUNK_SIZE = 1024 * 1024
+# Members closer than the gap are read together with one read of at most the batch size
+READ_BATCH_SIZE = 4 * 1024 * 1024
+READ_BATCH_GAP = 64 * 1024
+# Values of SlfEntry['state'], entries that are marked as deleted are skipped when reading
+SLF_ENTRY_STATE_OK = 0x00
+SLF_ENTRY_STATE_DELETED = 0xFF
 WRITING_NOT_SUPPORTED_ERROR = 'Writing to an SLF is not yet supported. Operation. {}'
 
 
+def _filetime_to_time(filetime):
+    try:
+        return gmtime(float(filetime) / 10000000.0 - 11644473600.0)
+    except OSError:
+        ## negative ts causes error on Windows: https://bugs.python.org/issue36439
+        return gmtime(0)
+
+
+def _time_to_filetime(time):
+    return int((timegm(time) + 11644473600.0) * 10000000.0)
+
+
 class SlfEntry(Ja2FileHeader):
     """
     Class Representation of a SlfEntry that represents a single file inside a slf file
+
+    Entries read from a slf file keep the time as FILETIME (see `filetime`), it is only converted when `time` is
+    accessed and written back unchanged unless `time` is set.
     """
     fields = [
         ('file_name', '256s'),
@@ -47,23 +82,63 @@ class SlfEntry(Ja2FileHeader):
         (None, '4x'),
     ]
 
+    def __init__(self, filetime=None, **kwargs):
+        self._filetime = None
+        super(SlfEntry, self).__init__(**kwargs)
+        if filetime is not None:
+            self._filetime = filetime
+
+    @property
+    def field_values(self):
+        if self._filetime is not None and 'time' not in self._field_values:
+            self._field_values['time'] = _filetime_to_time(self._filetime)
+        return self._field_values
+
+    @field_values.setter
+    def field_values(self, field_values):
+        self._field_values = field_values
+
+    @property
+    def filetime(self):
+        """The time as FILETIME"""
+        if self._filetime is not None:
+            return self._filetime
+        return _time_to_filetime(self['time'])
+
+    def __getitem__(self, key):
+        if key == 'time':
+            return self.field_values[key]
+        return self._field_values[key]
+
+    def __setitem__(self, key, value):
+        if key not in self._get_key_set():
+            raise KeyError('Invalid key {0}'.format(key))
+        if key == 'time':
+            self._filetime = None
+        self._field_values[key] = value
+
+    def __bytes__(self):
+        attrs = self._field_values
+        if self._filetime is not None:
+            attrs = dict(attrs, filetime=self._filetime)
+        raw_values = self.map_attrs_to_raw(attrs)
+        return self._get_struct().pack(*(raw_values[k] for k in self.keys()))
+
     @staticmethod
     def map_raw_to_attrs(raw):
         attrs = raw.copy()
         attrs['file_name'] = decode_ja2_string(raw['file_name'])
-        try:
-            attrs['time'] = gmtime(float(raw['time']) / 10000000.0 - 11644473600.0)
-        except OSError:
-            ## negative ts causes error on Windows: https://bugs.python.org/issue36439
-            attrs['time'] = gmtime(0)
-
+        attrs['filetime'] = attrs.pop('time')
         return attrs
 
     @staticmethod
     def map_attrs_to_raw(attrs):
         raw = attrs.copy()
         raw['file_name'] = encode_ja2_string(attrs['file_name'], pad=256)
-        raw['time'] = int((timegm(attrs['time']) + 11644473600.0) * 10000000.0)
+        if 'filetime' in raw:
+            raw['time'] = raw.pop('filetime')
+        else:
+            raw['time'] = _time_to_filetime(attrs['time'])
         return raw
 
 
@@ -97,6 +172,118 @@ class SlfHeader(Ja2FileHeader):
         return raw
 
 
+class SlfEntryTable(object):
+    """
+    Columnar representation of the entry table of a slf file
+
+    Offsets, lengths, states and times (as FILETIME) are stored in arrays and all names in a single string. Indexing
+    the table creates SlfEntry objects on demand.
+    """
+
+    # Offset and size of the fields in the encoded SlfEntry, see SlfEntry.fields
+    _NAME_SIZE = 256
+    _COLUMNS = {
+        'offsets': (256, 4, 'I'),
+        'lengths': (260, 4, 'I'),
+        'states': (264, 1, 'B'),
+        'times': (268, 8, 'q'),
+    }
+
+    def __init__(self, names, offsets, lengths, states, times):
+        self._names = '\n'.join(names)
+        self._name_starts = array('I', [0])
+        self._name_starts.extend(itertools.accumulate(len(n) + 1 for n in names))
+        self.offsets = array('I', offsets)
+        self.lengths = array('I', lengths)
+        self.states = array('B', states)
+        self.times = array('q', times)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self[i] for i in range(*index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        return SlfEntry(
+            file_name=self.name(index),
+            offset=self.offsets[index],
+            length=self.lengths[index],
+            state=self.states[index],
+            filetime=self.times[index]
+        )
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def name(self, index):
+        return self._names[self._name_starts[index]:self._name_starts[index + 1] - 1]
+
+    def names(self):
+        return self._names.split('\n') if len(self) else []
+
+    def time(self, index):
+        return _filetime_to_time(self.times[index])
+
+    @classmethod
+    def from_entries(cls, entries):
+        return cls(
+            list(e['file_name'] for e in entries),
+            list(e['offset'] for e in entries),
+            list(e['length'] for e in entries),
+            list(e['state'] for e in entries),
+            list(e.filetime for e in entries)
+        )
+
+    @classmethod
+    def from_bytes(cls, byte_str):
+        """Decodes consecutive encoded SlfEntries, each field is extracted for all entries at once"""
+        entry_size = SlfEntry.get_size()
+        number_of_entries = len(byte_str) // entry_size
+        byte_str = bytes(byte_str[:number_of_entries * entry_size])
+
+        columns = {}
+        for column, (offset, size, typecode) in cls._COLUMNS.items():
+            data = bytearray(size * number_of_entries)
+            for i in range(size):
+                data[i::size] = byte_str[offset + i::entry_size]
+            columns[column] = array(typecode, bytes(data))
+            if sys.byteorder != 'little':
+                columns[column].byteswap()
+
+        # Clear everything behind the names and terminate them with a newline, so they can be decoded at once
+        names = bytearray(byte_str)
+        zeros = bytes(number_of_entries)
+        for i in range(cls._NAME_SIZE, entry_size - 1):
+            names[i::entry_size] = zeros
+        names[entry_size - 1::entry_size] = b'\n' * number_of_entries
+        names = names.replace(b'\x00', b'').decode('ascii').split('\n')[:-1]
+
+        return cls(names, **columns)
+
+    def _get_column_bytes(self):
+        columns = [self.offsets, self.lengths, self.times, self.states]
+        if sys.byteorder != 'little':
+            columns = list(array(c.typecode, c) for c in columns)
+            for c in columns:
+                c.byteswap()
+        return b''.join(c.tobytes() for c in columns)
+
+    @classmethod
+    def _from_column_bytes(cls, names, number_of_entries, byte_str, offset=0):
+        columns = []
+        for typecode in ('I', 'I', 'q', 'B'):
+            column = array(typecode)
+            size = column.itemsize * number_of_entries
+            column.frombytes(byte_str[offset:offset + size])
+            if sys.byteorder != 'little':
+                column.byteswap()
+            columns.append(column)
+            offset += size
+        return cls(names, offsets=columns[0], lengths=columns[1], times=columns[2], states=columns[3])
+
+
 def _get_normalized_filename(name_in_slf):
     return '/' + '/'.join(name_in_slf.split('\\'))
 
@@ -105,9 +292,325 @@ def _get_slf_filename(name_in_fs):
     return '\\'.join(name_in_fs.strip('/').split('/'))
 
 
+def _get_lookup_path(path):
+    return abspath(normpath(path))
+
+
+def _get_folded_path(path):
+    return path.lower()
+
+
+def _get_case_merged_paths(paths):
+    """Spells every file and directory like the first path it occurs in, so paths differing in case are merged"""
+    spellings = {}
+    merged_paths = []
+    for path in paths:
+        merged_path = ''
+        for name in path[1:].split('/'):
+            merged_path = spellings.setdefault(_get_folded_path(merged_path + '/' + name), merged_path + '/' + name)
+        merged_paths.append(merged_path)
+    return merged_paths
+
+
+def _get_directories(paths):
+    directories = {'/'}
+    for path in paths:
+        directory = path[:path.rfind('/')]
+        while directory and directory not in directories:
+            directories.add(directory)
+            directory = directory[:directory.rfind('/')]
+    return directories
+
+
+def _get_fileno(file):
+    try:
+        return file.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return None
+
+
+def _copy_between_files(from_fileno, offset, length, to_file, to_fileno):
+    """
+    Copies a range of a file to the current position of another file without passing the data through python.
+    Returns the number of bytes copied, which is less than requested if the OS does not support copying these files.
+    """
+    to_file.flush()
+    to_offset = to_file.tell()
+    copied = 0
+    try:
+        while copied < length:
+            if hasattr(os, 'copy_file_range'):
+                count = os.copy_file_range(from_fileno, to_fileno, length - copied, offset + copied, to_offset + copied)
+            else:
+                os.lseek(to_fileno, to_offset + copied, os.SEEK_SET)
+                count = os.sendfile(to_fileno, from_fileno, offset + copied, length - copied)
+            if count == 0:
+                break
+            copied += count
+    except (AttributeError, OSError):
+        pass
+    to_file.seek(to_offset + copied, os.SEEK_SET)
+    return copied
+
+
+_INDEX_CACHE_HEADER = struct.Struct('<8sQqIII')
+_INDEX_CACHE_MAGIC = b'JA2SLFI2'
+
+
+def _get_index_cache_file_name(index_cache, slf_filename):
+    return os.path.join(index_cache, hashlib.sha1(slf_filename.encode('utf-8')).hexdigest() + '.idx')
+
+
+def _read_index_cache(cache_file_name, slf_stat):
+    """
+    Reads a cached SLF header, entry table and directories, returns None if there is no valid cache for the SLF-file
+    """
+    try:
+        with open(cache_file_name, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < _INDEX_CACHE_HEADER.size:
+        return None
+    magic, size, mtime, number_of_entries, names_size, directories_size = _INDEX_CACHE_HEADER.unpack_from(data)
+    if magic != _INDEX_CACHE_MAGIC or size != slf_stat.st_size or mtime != slf_stat.st_mtime_ns:
+        return None
+    if len(data) != (_INDEX_CACHE_HEADER.size + SlfHeader.get_size() + names_size + directories_size +
+                     number_of_entries * 17):
+        return None
+
+    offset = _INDEX_CACHE_HEADER.size
+    header = SlfHeader.from_bytes(data[offset:offset + SlfHeader.get_size()])
+    offset += SlfHeader.get_size()
+    names = data[offset:offset + names_size].decode('ascii').split('\n') if number_of_entries else []
+    offset += names_size
+    directories = set(data[offset:offset + directories_size].decode('ascii').split('\x00'))
+    offset += directories_size
+    entry_table = SlfEntryTable._from_column_bytes(names, number_of_entries, data, offset)
+    return header, entry_table, directories
+
+
+def _write_index_cache(cache_file_name, slf_stat, header, entry_table, directories):
+    """Caches the SLF header, entry table and directories, failing to write the cache is not an error"""
+    names = entry_table._names.encode('ascii')
+    directories = '\x00'.join(sorted(directories)).encode('ascii')
+    data = b''.join([
+        _INDEX_CACHE_HEADER.pack(_INDEX_CACHE_MAGIC, slf_stat.st_size, slf_stat.st_mtime_ns, len(entry_table),
+                                 len(names), len(directories)),
+        bytes(header),
+        names,
+        directories,
+        entry_table._get_column_bytes()
+    ])
+    temp_file_name = None
+    try:
+        os.makedirs(os.path.dirname(cache_file_name), exist_ok=True)
+        fd, temp_file_name = tempfile.mkstemp(suffix='.idx', dir=os.path.dirname(cache_file_name))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_file_name, cache_file_name)
+    except OSError:
+        if temp_file_name is not None and os.path.exists(temp_file_name):
+            os.remove(temp_file_name)
+
+
+class _MemoryViewFile(io.BufferedIOBase):
+    """
+    Read-only file object on top of a memoryview, the viewed data is not copied until it is read
+    """
+
+    def __init__(self, view):
+        super(_MemoryViewFile, self).__init__()
+        self._view = view
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def getbuffer(self):
+        self._check_not_closed()
+        return self._view
+
+    def read(self, size=-1):
+        self._check_not_closed()
+        start = min(self._position, len(self._view))
+        end = len(self._view) if size is None or size < 0 else min(start + size, len(self._view))
+        self._position = end
+        # Reading all of a view of bytes, e.g. of cached data, returns them without copying
+        if start == 0 and end == len(self._view) and isinstance(self._view.obj, bytes) and \
+                len(self._view.obj) == end:
+            return self._view.obj
+        return bytes(self._view[start:end])
+
+    read1 = read
+
+    def readinto(self, buffer):
+        self._check_not_closed()
+        buffer = memoryview(buffer).cast('B')
+        start = min(self._position, len(self._view))
+        end = min(start + len(buffer), len(self._view))
+        buffer[:end - start] = self._view[start:end]
+        self._position = end
+        return end - start
+
+    readinto1 = readinto
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self._check_not_closed()
+        if whence == os.SEEK_SET:
+            position = offset
+        elif whence == os.SEEK_CUR:
+            position = self._position + offset
+        elif whence == os.SEEK_END:
+            position = len(self._view) + offset
+        else:
+            raise ValueError('Invalid whence ({0})'.format(whence))
+        if position < 0:
+            raise ValueError('Negative seek position {0}'.format(position))
+        self._position = position
+        return position
+
+    def tell(self):
+        self._check_not_closed()
+        return self._position
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+        super(_MemoryViewFile, self).close()
+
+    def _check_not_closed(self):
+        if self.closed:
+            raise ValueError('I/O operation on closed file.')
+
+
+SlfCacheInfo = namedtuple('SlfCacheInfo', ['hits', 'misses', 'evictions', 'size', 'max_size'])
+
+
+class _MemberCache(object):
+    """
+    Least recently used cache of file contents with a limit on the total number of bytes
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._data.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        # Data larger than the cache would only evict everything else
+        if len(data) > self.max_size:
+            return
+        with self._lock:
+            if key in self._data:
+                return
+            self._data[key] = data
+            self.size += len(data)
+            while self.size > self.max_size:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def info(self):
+        with self._lock:
+            return SlfCacheInfo(self.hits, self.misses, self.evictions, self.size, self.max_size)
+
+
+class _WindowedFile(io.RawIOBase):
+    """
+    Read-only file object on top of a range of an SLF-file, only the parts that are read are read from the SLF-file
+    """
+
+    def __init__(self, slf_fs, offset, length):
+        super(_WindowedFile, self).__init__()
+        self._slf_fs = slf_fs
+        self._offset = offset
+        self._length = length
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        self._check_not_closed()
+        buffer = memoryview(buffer).cast('B')
+        size = max(min(len(buffer), self._length - self._position), 0)
+        if size == 0:
+            return 0
+        size = self._slf_fs._read_into(self._offset + self._position, buffer[:size])
+        self._position += size
+        return size
+
+    def readall(self):
+        self._check_not_closed()
+        size = max(self._length - self._position, 0)
+        data = self._slf_fs._read(self._offset + self._position, size) if size > 0 else b''
+        self._position += len(data)
+        return data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self._check_not_closed()
+        if whence == os.SEEK_SET:
+            position = offset
+        elif whence == os.SEEK_CUR:
+            position = self._position + offset
+        elif whence == os.SEEK_END:
+            position = self._length + offset
+        else:
+            raise ValueError('Invalid whence ({0})'.format(whence))
+        if position < 0:
+            raise ValueError('Negative seek position {0}'.format(position))
+        self._position = position
+        return position
+
+    def tell(self):
+        self._check_not_closed()
+        return self._position
+
+    def _check_not_closed(self):
+        if self.closed:
+            raise ValueError('I/O operation on closed file.')
+
+
 class SlfFS(FS):
     """
     Implements a read-only file system on top of a SLF-file
+
+    Opened binary files read lazily from their range of the SLF-file, so only the parts that are read are read.
+    With `mmap=True` the SLF-file is memory mapped and opened binary files are read-only views into the mapping,
+    so file contents are not copied when opening them.
+
+    SLF-files opened by filename are read with positional reads (where the OS supports them) or through the mapping,
+    so multiple threads can read from the same SlfFS in parallel.
+
+    `index_cache` is an optional directory to cache parsed entry tables in. Cached tables are reused as long as the
+    size and modification time of the SLF-file stay the same.
+
+    With `case_insensitive` paths are resolved regardless of their case, like the game does. Files and directories
+    that only differ in case are merged, the spelling of the first entry in the SLF-file is used.
+
+    `cache_size` enables a cache of up to that many bytes for the contents of opened files, the least recently used
+    files are evicted first. Cached contents are immutable and opened without copying them, see `cache_info`.
     """
 
     _meta = {
@@ -120,9 +623,10 @@ class SlfFS(FS):
         'atomic.setcontents': False
     }
 
-    def __init__(self, slf_filename):
+    def __init__(self, slf_filename, mmap=False, index_cache=None, case_insensitive=False, cache_size=None):
         super(SlfFS, self).__init__()
 
+        self._owns_file = isinstance(slf_filename, str)
         if isinstance(slf_filename, str):
             slf_filename = os.path.expanduser(os.path.expandvars(slf_filename))
             slf_filename = os.path.normpath(os.path.abspath(slf_filename))
@@ -138,72 +642,229 @@ class SlfFS(FS):
             self.file_name = 'file-like'
             self.file = slf_filename
 
-        self.header = SlfHeader.from_bytes(self.file.read(SlfHeader.get_size()))
-        self.entries = list(map(self._read_entry, range(self.header['number_of_entries'])))
+        self._mapping = None
+        self._memory = None
+        self._cache = _MemberCache(cache_size) if cache_size else None
+        if mmap:
+            self._map_file()
+        # Positional reads do not touch the shared file position
+        self._fileno = self.file.fileno() if self._owns_file and hasattr(os, 'pread') else None
+        if self._memory is not None or self._fileno is not None:
+            self._meta = dict(SlfFS._meta, thread_safe=True)
+
+        cached_index = None
+        if index_cache is not None and self._owns_file:
+            cache_file_name = _get_index_cache_file_name(index_cache, self.file_name)
+            cached_index = _read_index_cache(cache_file_name, os.fstat(self.file.fileno()))
+
+        if cached_index is not None:
+            self.header, self.entry_table, directories = cached_index
+        else:
+            self.header = SlfHeader.from_bytes(self.file.read(SlfHeader.get_size()))
+            self.entry_table = self._read_entries()
+            directories = None
 
         self.library_name = self.header['library_name']
         self.library_path = self.header['library_path']
         self.sort = self.header['sort']
         self.version = self.header['version']
 
-        self._path_fs = MemoryFS()
-        for e in self.entries:
-            path = _get_normalized_filename(e['file_name']).split('/')
-            directory = '/'.join(path[:-1]) if len(path) > 2 else '/'
+        # Index all paths up front, so lookups do not need to scan the entries
+        # Sometimes there exists a file that has the same name as a directory
+        # Solution: Rename it with a _DIRECTORY_CONFLICT suffix
+        # Paths map to the index of their entry in the entry table
+        names = self.entry_table.names()
+        states = self.entry_table.states
+        live_indices = list(i for i in range(len(names)) if states[i] != SLF_ENTRY_STATE_DELETED)
+        paths = list(_get_normalized_filename(names[i]) for i in live_indices)
+        if directories is None:
+            directories = _get_directories(paths)
+        # The index cache keeps the directories as they are spelled in the SLF-file
+        cached_directories = directories
+        if case_insensitive:
+            # Merged in entry table order, so the spelling that is used does not depend on set order
+            paths = _get_case_merged_paths(paths)
+            directories = _get_directories(paths)
+        self._directories = directories
+        self._entries_by_path = {}
+        for path, index in zip(paths, live_indices):
+            if path in self._directories:
+                path += DIRECTORY_CONFLICT_SUFFIX
+            self._entries_by_path.setdefault(path, index)
+        # Directory contents are only needed for listing, they are collected on first use
+        self._directory_contents = None
+        # Case folded paths map to the path in the index
+        self._folded_paths = None
+        if case_insensitive:
+            self._meta = dict(self._meta, case_insensitive_paths=True)
+            self._folded_paths = {}
+            for path in itertools.chain(self._directories, self._entries_by_path):
+                self._folded_paths.setdefault(_get_folded_path(path), path)
 
-            if self._path_fs.isfile(directory):
-                # Sometimes there exists a file that has the same name as a directory
-                # Solution: Rename it with a _DIRECTORY_CONFLICT suffix
-                self._path_fs.move(directory, directory + DIRECTORY_CONFLICT_SUFFIX)
+        if index_cache is not None and self._owns_file and cached_index is None:
+            _write_index_cache(cache_file_name, os.fstat(self.file.fileno()), self.header, self.entry_table,
+                               cached_directories)
 
-            if self._path_fs.isdir('/'.join(path)):
-                self._path_fs.createfile('/'.join(path) + DIRECTORY_CONFLICT_SUFFIX)
-            else:
-                self._path_fs.makedir(directory, recursive=True, allow_recreate=True)
-                self._path_fs.createfile('/'.join(path))
+    @property
+    def entries(self):
+        """All entries of the SLF-file as a list of SlfEntry, including deleted ones"""
+        return list(self.entry_table)
 
-    def _read_entry(self, index):
-        entry_size = SlfEntry.get_size()
-        self.file.seek(-entry_size * (self.header['number_of_entries'] - index), os.SEEK_END)
-        return SlfEntry.from_bytes(self.file.read(entry_size))
+    def _read_entries(self):
+        # A negative number of entries is read as an empty table, whether the SLF-file is a file or file-like
+        table_size = SlfEntry.get_size() * max(self.header['number_of_entries'], 0)
+        self.file.seek(-table_size, os.SEEK_END)
+        return SlfEntryTable.from_bytes(self.file.read(table_size))
+
+    def _read(self, offset, length):
+        """Reads a range of the SLF-file, returns a memoryview in memory mapped mode and bytes otherwise"""
+        if self._memory is not None:
+            return self._memory[offset:offset + length]
+        if self._fileno is not None:
+            chunks = []
+            while length > 0:
+                chunk = os.pread(self._fileno, length, offset)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                offset += len(chunk)
+                length -= len(chunk)
+            return chunks[0] if len(chunks) == 1 else b''.join(chunks)
+        with self._lock:
+            self.file.seek(offset, os.SEEK_SET)
+            return self.file.read(length)
+
+    def _read_into(self, offset, buffer):
+        """Reads a range of the SLF-file into a writable byte memoryview, returns the number of bytes read"""
+        if self._memory is not None:
+            data = self._memory[offset:offset + len(buffer)]
+            buffer[:len(data)] = data
+            return len(data)
+        if self._fileno is not None:
+            size = 0
+            while size < len(buffer):
+                if hasattr(os, 'preadv'):
+                    read = os.preadv(self._fileno, [buffer[size:]], offset + size)
+                else:
+                    chunk = os.pread(self._fileno, len(buffer) - size, offset + size)
+                    read = len(chunk)
+                    buffer[size:size + read] = chunk
+                if not read:
+                    break
+                size += read
+            return size
+        with self._lock:
+            self.file.seek(offset, os.SEEK_SET)
+            # File-likes only need to implement read
+            if not hasattr(self.file, 'readinto'):
+                data = self.file.read(len(buffer))
+                buffer[:len(data)] = data
+                return len(data)
+            size = 0
+            while size < len(buffer):
+                read = self.file.readinto(buffer[size:])
+                if not read:
+                    break
+                size += read
+            return size
+
+    def _copy_range_to(self, offset, length, to_file):
+        """Copies a range of the SLF-file to `to_file` without reading it into memory at once"""
+        if self._memory is not None:
+            to_file.write(self._memory[offset:offset + length])
+            return
+        to_fileno = _get_fileno(to_file) if self._fileno is not None else None
+        if to_fileno is not None:
+            copied = _copy_between_files(self._fileno, offset, length, to_file, to_fileno)
+            offset += copied
+            length -= copied
+        while length > 0:
+            chunk = self._read(offset, min(length, COPY_CHUNK_SIZE))
+            if not chunk:
+                break
+            to_file.write(chunk)
+            offset += len(chunk)
+            length -= len(chunk)
+
+    def _map_file(self):
+        if hasattr(self.file, 'getbuffer'):
+            self._memory = self.file.getbuffer()
+            return
+        try:
+            self._mapping = memory_map(self.file.fileno(), 0, access=ACCESS_READ)
+        except (AttributeError, io.UnsupportedOperation, ValueError, OSError) as e:
+            raise CreateFailedError('Slf file can not be memory mapped ({0})'.format(self.file_name), details=e)
+        self._memory = memoryview(self._mapping)
+
+    def close(self):
+        if self._memory is not None:
+            self._memory.release()
+            self._memory = None
+        if self._mapping is not None:
+            try:
+                self._mapping.close()
+            except BufferError:
+                # Views into the mapping are still in use, it is unmapped once they are released
+                pass
+            self._mapping = None
+        if self._owns_file:
+            self.file.close()
+        # The descriptor number may be reused after closing
+        self._fileno = None
+        super(SlfFS, self).close()
 
     def __str__(self):
         return '<SlfFS: {0}>'.format(self['library_name'])
 
+    def exists(self, path):
+        path = self._resolve_path(path)
+        return path in self._entries_by_path or path in self._directories
+
     def isfile(self, path):
-        return self._path_fs.isfile(path)
+        return self._resolve_path(path) in self._entries_by_path
 
     def isdir(self, path):
-        return self._path_fs.isdir(path)
+        return self._resolve_path(path) in self._directories
 
     def listdir(self, path="/", wildcard=None, full=False, absolute=False, dirs_only=False, files_only=False):
-        return self._path_fs.listdir(path, wildcard, full, absolute, dirs_only, files_only)
+        lookup_path = self._resolve_path(path)
+        if lookup_path not in self._directories:
+            if lookup_path in self._entries_by_path:
+                raise ResourceInvalidError(path, msg="Can't list a file: %(path)s")
+            raise ResourceNotFoundError(path)
+        names = sorted(self._get_directory_contents()[lookup_path])
+        return self._listdir_helper(path, names, wildcard, full, absolute, dirs_only, files_only)
 
     def open(self, path, mode='r', buffering=-1, encoding='ascii', errors=None, newline=None, line_buffering=False, **kwargs):
         if mode != 'r' and mode != 'rb':
             raise UnsupportedError(WRITING_NOT_SUPPORTED_ERROR.format('open'))
-        if not self.exists(path):
-            raise ResourceNotFoundError(path)
-        if self.isdir(path):
-            raise ResourceInvalidError(path)
-        slf_entry = self._get_slf_entry_for_path(path)
+        index = self._get_existing_entry_index(path)
+        offset, length = self.entry_table.offsets[index], self.entry_table.lengths[index]
 
-        self.file.seek(slf_entry['offset'], os.SEEK_SET)
+        if self._cache is not None:
+            data = self._read_cached(offset, length)
+            if mode == 'rb':
+                return _MemoryViewFile(memoryview(data))
+            return io.StringIO(str(data, encoding or 'ascii'))
         if mode == 'rb':
-            return io.BytesIO(self.file.read(slf_entry['length']))
-        return io.StringIO(self.file.read(slf_entry['length']).decode(encoding))
+            if self._memory is not None:
+                return _MemoryViewFile(self._read(offset, length))
+            # Buffered, so small reads like those of the header parsers do not each read from the SLF-file
+            buffer_size = buffering if buffering > 1 else io.DEFAULT_BUFFER_SIZE
+            return io.BufferedReader(_WindowedFile(self, offset, length), buffer_size)
+        return io.StringIO(str(self._read(offset, length), encoding or 'ascii'))
 
     def getinfo(self, path):
-        if not self.exists(path):
+        index = self._get_entry_index(path)
+        if index is None:
+            if self.isdir(path):
+                return {
+                    'size': 0
+                }
             raise ResourceNotFoundError(path)
-        if self.isdir(path):
-            return {
-                'size': 0
-            }
-        slf_entry = self._get_slf_entry_for_path(path)
         return {
-            'size': slf_entry['length'],
-            'modified_time': slf_entry['time']
+            'size': self.entry_table.lengths[index],
+            'modified_time': self.entry_table.time(index)
         }
 
     def makedir(self, path, recursive=False, allow_recreate=False):
@@ -218,18 +879,193 @@ class SlfFS(FS):
     def rename(self, src, dst):
         raise UnsupportedError(WRITING_NOT_SUPPORTED_ERROR.format('rename'))
 
+    def _resolve_path(self, path):
+        path = _get_lookup_path(path)
+        if self._folded_paths is not None:
+            return self._folded_paths.get(_get_folded_path(path), path)
+        return path
+
+    def _get_entry_index(self, path):
+        return self._entries_by_path.get(self._resolve_path(path))
+
     def _get_slf_entry_for_path(self, path):
-        if path.endswith(DIRECTORY_CONFLICT_SUFFIX):
-            path = path[:-len(DIRECTORY_CONFLICT_SUFFIX)]
-        return next(e for e in self.entries if _get_normalized_filename(e['file_name']) == path)
+        index = self._get_entry_index(path)
+        return self.entry_table[index] if index is not None else None
+
+    def _read_cached(self, offset, length):
+        # Entries sharing their data share the cached data as well
+        key = (offset, length)
+        data = self._cache.get(key)
+        if data is None:
+            data = bytes(self._read(*key))
+            self._cache.put(key, data)
+        return data
+
+    def cache_info(self):
+        """Returns a SlfCacheInfo with the hits, misses, evictions and size of the cache, or None without cache"""
+        return self._cache.info() if self._cache is not None else None
+
+    def _get_existing_entry_index(self, path):
+        index = self._get_entry_index(path)
+        if index is None:
+            if self.isdir(path):
+                raise ResourceInvalidError(path)
+            raise ResourceNotFoundError(path)
+        return index
+
+    def _get_read_batches(self, requests):
+        """Groups (key, entry index) requests sorted by offset into batches that are read at once"""
+        offsets, lengths = self.entry_table.offsets, self.entry_table.lengths
+        batch = []
+        start = end = 0
+        for key, index in requests:
+            offset, length = offsets[index], lengths[index]
+            if batch and (offset < start or offset > end + READ_BATCH_GAP or
+                          max(end, offset + length) - start > READ_BATCH_SIZE):
+                yield start, end, batch
+                batch = []
+            if not batch:
+                start = end = offset
+            batch.append((key, index))
+            end = max(end, offset + length)
+        if batch:
+            yield start, end, batch
+
+    def _iter_requests(self, requests, order):
+        if order == 'offset':
+            offsets = self.entry_table.offsets
+            requests = sorted(requests, key=lambda r: offsets[r[1]])
+        elif order is not None:
+            raise ValueError('Invalid order ({0})'.format(order))
+        if self._cache is None:
+            return self._read_requests(requests)
+        return self._iter_cached_requests(requests)
+
+    def _iter_cached_requests(self, requests):
+        """Yields cached contents from the cache, the others are read in batches and added to the cache"""
+        offsets, lengths = self.entry_table.offsets, self.entry_table.lengths
+        cached = list(self._cache.get((offsets[index], lengths[index])) for _, index in requests)
+        read = self._read_requests(r for r, data in zip(requests, cached) if data is None)
+        for (key, index), data in zip(requests, cached):
+            if data is None:
+                _, data = next(read)
+                self._cache.put((offsets[index], lengths[index]), data)
+            yield key, data
+
+    def _read_requests(self, requests):
+        batches = list(self._get_read_batches(requests))
+        if batches:
+            self._advise_readahead(batches[0][0], batches[0][1])
+        for i, (start, end, batch) in enumerate(batches):
+            # Let the OS read the next batch while this one is processed
+            if i + 1 < len(batches):
+                self._advise_readahead(batches[i + 1][0], batches[i + 1][1])
+            data = memoryview(self._read(start, end - start))
+            for key, index in batch:
+                offset = self.entry_table.offsets[index] - start
+                yield key, bytes(data[offset:offset + self.entry_table.lengths[index]])
+
+    def _advise_readahead(self, start, end):
+        # A length of 0 would advise to read ahead up to the end of the SLF-file
+        if self._fileno is not None and hasattr(os, 'posix_fadvise') and end > start:
+            os.posix_fadvise(self._fileno, start, end - start, os.POSIX_FADV_WILLNEED)
+
+    def iter_members(self, paths=None, order='offset'):
+        """
+        Yields (path, contents) for the files in `paths`, or for all files
+
+        With `order='offset'` the files are read in the order they are stored, members close to each other are read
+        with a single read and the OS is asked to read ahead the next batch. With `order=None` the files are yielded in
+        the order of `paths`, still reading adjacent members together. With a cache, cached files are not read again
+        and the read files are added to it.
+        """
+        if paths is None:
+            requests = list(self._entries_by_path.items())
+        else:
+            requests = list((path, self._get_existing_entry_index(path)) for path in paths)
+        return self._iter_requests(requests, order)
+
+    def read_many(self, paths):
+        """Returns the contents of the files in `paths` in the same order, reading them in the order they are stored"""
+        paths = list(paths)
+        contents = [None] * len(paths)
+        requests = list((i, self._get_existing_entry_index(path)) for i, path in enumerate(paths))
+        for i, data in self._iter_requests(requests, 'offset'):
+            contents[i] = data
+        return contents
+
+    def _get_directory_contents(self):
+        if self._directory_contents is None:
+            contents = dict((d, set()) for d in self._directories)
+            for path in itertools.chain(self._directories, self._entries_by_path):
+                if path != '/':
+                    directory, name = pathsplit(path)
+                    contents[directory].add(name)
+            self._directory_contents = contents
+        return self._directory_contents
+
+    def _remove_from_parent_directory(self, path):
+        if self._directory_contents is not None:
+            directory, name = pathsplit(path)
+            self._directory_contents[directory].discard(name)
+
+    def _remove_path(self, path):
+        lookup_path = self._resolve_path(path)
+        if lookup_path not in self._entries_by_path:
+            if lookup_path in self._directories:
+                raise ResourceInvalidError(path, msg="That's a directory, not a file: %(path)s")
+            raise ResourceNotFoundError(path)
+        del self._entries_by_path[lookup_path]
+        self._remove_from_parent_directory(lookup_path)
+
+    def _remove_directory(self, path, recursive=False, force=False):
+        lookup_path = self._resolve_path(path)
+        if lookup_path == '/':
+            raise RemoveRootError(path)
+        if lookup_path not in self._directories:
+            if lookup_path in self._entries_by_path:
+                raise ResourceInvalidError(path, msg="Can't remove resource, its not a directory: %(path)s")
+            raise ResourceNotFoundError(path)
+        contents = self._get_directory_contents()
+        if contents[lookup_path] and not force:
+            raise DirectoryNotEmptyError(path)
+
+        prefix = lookup_path + '/'
+        for p in list(p for p in self._entries_by_path if p.startswith(prefix)):
+            del self._entries_by_path[p]
+        for p in list(p for p in self._directories if p.startswith(prefix)):
+            self._directories.remove(p)
+            del contents[p]
+        self._directories.remove(lookup_path)
+        del contents[lookup_path]
+        self._remove_from_parent_directory(lookup_path)
+
+        if recursive:
+            # Like MemoryFS, remove parent directories that became empty
+            directory = pathsplit(lookup_path)[0]
+            while directory != '/' and not contents[directory]:
+                self._directories.remove(directory)
+                del contents[directory]
+                self._remove_from_parent_directory(directory)
+                directory = pathsplit(directory)[0]
 
 
 class BufferedSlfFS(MultiFS):
-    def __init__(self, slf_filename=None):
+    """
+    Implements a writable file system on top of a SLF-file, changes are buffered in memory
+
+    Use `save` to write a new SLF-file, or `update` to write the changes into the opened SLF-file in place.
+    `cache_size` enables the cache of the underlying SlfFS.
+    """
+
+    def __init__(self, slf_filename=None, mmap=False, cache_size=None):
         super(BufferedSlfFS, self).__init__()
 
+        self._mmap = mmap
+        self._cache_size = cache_size
+        self._file_fs = None
         if slf_filename is not None:
-            self._file_fs = SlfFS(slf_filename)
+            self._file_fs = SlfFS(slf_filename, mmap=mmap, cache_size=cache_size)
             self.addfs('file', self._file_fs)
             self.library_name = self._file_fs.library_name
             self.library_path = self._file_fs.library_path
@@ -247,43 +1083,273 @@ class BufferedSlfFS(MultiFS):
         self._memory_fs = MemoryFS()
         self.addfs('memory', self._memory_fs, write=True)
 
+    def _reload(self):
+        """Reopens the SLF-file after it was written to and discards the buffered changes"""
+        if self._file_fs._owns_file:
+            slf_filename = self._file_fs.file_name
+        else:
+            slf_filename = self._file_fs.file
+            slf_filename.seek(0, os.SEEK_SET)
+        self._file_fs.close()
+        self.removefs('file')
+        self.removefs('memory')
+
+        self._file_fs = SlfFS(slf_filename, mmap=self._mmap, cache_size=self._cache_size)
+        self._memory_fs = MemoryFS()
+        self.addfs('file', self._file_fs)
+        self.addfs('memory', self._memory_fs, write=True)
+
     def remove(self, path):
-        if self._file_fs.exists(path):
-            return self._file_fs._path_fs.remove(path)
+        if self._file_fs is not None and self._file_fs.exists(path):
+            return self._file_fs._remove_path(path)
         return super(BufferedSlfFS, self).remove(path)
 
     def removedir(self, path, recursive=False, force=False):
-        if self._file_fs.exists(path):
-            return self._file_fs._path_fs.removedir(path, recursive=recursive, force=force)
+        if self._file_fs is not None and self._file_fs.exists(path):
+            return self._file_fs._remove_directory(path, recursive=recursive, force=force)
         return super(BufferedSlfFS, self).removedir(path, recursive=recursive, force=force)
 
-    def save(self, to_file):
-        header_size = SlfHeader.get_size()
-        names = list(self.walkfiles('/'))
+    def cache_info(self):
+        """Returns the SlfCacheInfo of the opened SLF-file, or None without cache"""
+        return self._file_fs.cache_info() if self._file_fs is not None else None
+
+    def _get_members(self):
+        """
+        Yields (file name in slf, size, FILETIME, entry index, path) per file, the entry index is None for buffered
+        files
+        """
+        for name in self.walkfiles('/'):
+            if self._file_fs is not None and self.which(name)[1] is self._file_fs:
+                entry_table = self._file_fs.entry_table
+                index = self._file_fs._get_entry_index(name)
+                yield entry_table.name(index), entry_table.lengths[index], entry_table.times[index], index, name
+            else:
+                info = self._memory_fs.getinfo(name)
+                modified_time = info['modified_time']
+                if isinstance(modified_time, datetime):
+                    modified_time = modified_time.timetuple()
+                yield _get_slf_filename(name), info['size'], _time_to_filetime(modified_time), None, name
+
+    def _get_member_key(self, index, path):
+        """Returns a key that is equal for members with equal contents"""
+        digest = hashlib.sha256()
+        if index is not None:
+            offset, length = self._file_fs.entry_table.offsets[index], self._file_fs.entry_table.lengths[index]
+            while length > 0:
+                chunk = self._file_fs._read(offset, min(length, COPY_CHUNK_SIZE))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                offset += len(chunk)
+                length -= len(chunk)
+        else:
+            with self._memory_fs.open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+        return digest.digest()
+
+    def _get_member_keys(self, members):
+        """Returns content keys for all members whose size is shared with another member, None for the others"""
+        sizes = Counter(size for _, size, _, _, _ in members)
+        keys = []
+        digests_by_range = {}
+        for _, size, _, index, path in members:
+            if sizes[size] < 2:
+                keys.append(None)
+            elif index is not None:
+                # Entries sharing their data in the original SLF-file only need to be hashed once
+                data_range = (self._file_fs.entry_table.offsets[index], size)
+                if data_range not in digests_by_range:
+                    digests_by_range[data_range] = self._get_member_key(index, path)
+                keys.append((size, digests_by_range[data_range]))
+            else:
+                keys.append((size, self._get_member_key(index, path)))
+        return keys
+
+    def save(self, to_file, deduplicate=False):
+        """
+        Writes the buffered file system as a SLF-file to `to_file`
 
-        offset_start = header_size
-        sizes = list(self.getinfo(f)['size'] for f in names)
-        times = list(self.getinfo(f)['modified_time'] for f in names)
-        times = list(t.timetuple() if isinstance(t, datetime) else t for t in times)
-        offsets = list(sum(sizes[:i]) + offset_start for i in range(len(sizes)))
+        Unchanged files are copied from the original SLF-file in chunks (inside the kernel if both are real files),
+        only files written to this file system pass through python.
 
-        header = SlfHeader(
+        With `deduplicate` files with equal contents are stored once and their entries point to the same data. Only
+        files that have the same size as another file are hashed to find them.
+        """
+        members = list(self._get_members())
+        keys = self._get_member_keys(members) if deduplicate else itertools.repeat(None)
+
+        to_file.write(bytes(self._get_header(len(members), len(members))))
+
+        entry_headers = []
+        offsets_by_key = {}
+        offset = SlfHeader.get_size()
+        for (file_name, size, filetime, index, path), key in zip(members, keys):
+            if key is not None and key in offsets_by_key:
+                entry_headers.append(SlfEntry(file_name=file_name, offset=offsets_by_key[key], length=size,
+                                              filetime=filetime, state=0))
+                continue
+            if index is not None:
+                self._file_fs._copy_range_to(self._file_fs.entry_table.offsets[index], size, to_file)
+            else:
+                with self._memory_fs.open(path, 'rb') as f:
+                    shutil.copyfileobj(f, to_file, COPY_CHUNK_SIZE)
+            entry_headers.append(SlfEntry(file_name=file_name, offset=offset, length=size, filetime=filetime, state=0))
+            if key is not None:
+                offsets_by_key[key] = offset
+            offset += size
+
+        to_file.write(b''.join(bytes(e) for e in entry_headers))
+
+    def _get_header(self, number_of_entries, used):
+        return SlfHeader(
            library_name=self.library_name,
            library_path=self.library_path,
-           number_of_entries=len(names),
-           used=len(names),
+           number_of_entries=number_of_entries,
+           used=used,
            sort=self.sort,
            version=self.version,
            contains_subdirectories=self.contains_subdirectories
         )
 
-        to_file.write(bytes(header))
+    def update(self):
+        """
+        Writes the buffered changes into the opened SLF-file in place
+
+        Buffered files are appended to the existing data and only the entry table behind it and the header are
+        rewritten. Entries of removed or replaced files are kept, but marked as deleted, use `compact` to reclaim
+        their space. The SLF-file is not consistent while it is being updated.
+        """
+        if self._file_fs is None:
+            raise UnsupportedError('Updating requires an opened SLF-file')
+        file_fs = self._file_fs
+        members = list(self._get_members())
+
+        kept = set(index for _, _, _, index, _ in members if index is not None)
+        entries = list(file_fs.entry_table)
+        for i, slf_entry in enumerate(entries):
+            if i not in kept:
+                slf_entry['state'] = SLF_ENTRY_STATE_DELETED
+
+        # Release the mapping before the SLF-file changes
+        file_fs.close()
+        to_file = open(file_fs.file_name, 'r+b') if file_fs._owns_file else file_fs.file
+        try:
+            offset = to_file.seek(0, os.SEEK_END) - SlfEntry.get_size() * len(file_fs.entry_table)
+            to_file.seek(offset, os.SEEK_SET)
+            for file_name, size, filetime, index, path in members:
+                if index is not None:
+                    continue
+                with self._memory_fs.open(path, 'rb') as f:
+                    shutil.copyfileobj(f, to_file, COPY_CHUNK_SIZE)
+                entries.append(SlfEntry(file_name=file_name, offset=offset, length=size, filetime=filetime,
+                                        state=SLF_ENTRY_STATE_OK))
+                offset += size
+            to_file.write(b''.join(bytes(e) for e in entries))
+            to_file.truncate()
+
+            to_file.seek(0, os.SEEK_SET)
+            to_file.write(bytes(self._get_header(len(entries), len(members))))
+            to_file.flush()
+        finally:
+            if file_fs._owns_file:
+                to_file.close()
+
+        self._reload()
+
+    def compact(self, deduplicate=False):
+        """
+        Rewrites the opened SLF-file without the space taken up by deleted entries, including buffered changes
 
-        for name in names:
-            with self.open(name, 'rb') as f:
-                to_file.write(f.read())
-        for name, modified_time, size, offset in zip(names, times, sizes, offsets):
-            entry_header = SlfEntry(file_name=_get_slf_filename(name), offset=offset, length=size, time=modified_time, state=0)
-            to_file.write(bytes(entry_header))
+        `deduplicate` is passed on to `save`.
+        """
+        if self._file_fs is None:
+            raise UnsupportedError('Compacting requires an opened SLF-file')
+        file_fs = self._file_fs
+
+        if file_fs._owns_file:
+            fd, temp_file_name = tempfile.mkstemp(suffix='.slf', dir=os.path.dirname(file_fs.file_name))
+            try:
+                with os.fdopen(fd, 'wb') as to_file:
+                    self.save(to_file, deduplicate=deduplicate)
+                shutil.copymode(file_fs.file_name, temp_file_name)
+                file_fs.close()
+                os.replace(temp_file_name, file_fs.file_name)
+            except BaseException:
+                if os.path.exists(temp_file_name):
+                    os.remove(temp_file_name)
+                raise
+        else:
+            with tempfile.TemporaryFile() as temp_file:
+                self.save(temp_file, deduplicate=deduplicate)
+                file_fs.close()
+                temp_file.seek(0, os.SEEK_SET)
+                file_fs.file.seek(0, os.SEEK_SET)
+                shutil.copyfileobj(temp_file, file_fs.file, COPY_CHUNK_SIZE)
+                file_fs.file.truncate()
+                file_fs.file.flush()
 
+        self._reload()
 
+
+def _get_extraction_path(destination, path):
+    """Returns where a file of the SLF-file is extracted to, raises BackReferenceError if it is outside `destination`"""
+    parts = path[1:].split('/')
+    to_path = os.path.join(destination, *parts)
+    root = os.path.abspath(destination)
+    if (any(p in ('', '.', '..') or os.path.isabs(p) or os.path.splitdrive(p)[0] for p in parts) or
+            os.path.commonpath([root, os.path.abspath(to_path)]) != root):
+        raise BackReferenceError('Path outside of the destination \'%s\'' % path)
+    return to_path
+
+
+def extract_slf(slf_fs, destination, jobs=None, paths=None):
+    """
+    Extracts the files of an SLF-file into the directory `destination`, returns the paths of the extracted files
+
+    `slf_fs` is a SlfFS or the name of an SLF-file. All writes are planned up front, directories are created once and
+    the files are written by a pool of `jobs` threads (by default one per CPU) in the order they are stored in the
+    SLF-file, so it is read sequentially. `paths` restricts the extraction to the given files. Raises
+    BackReferenceError before anything is written if a file would be extracted outside of `destination`.
+    """
+    owns_slf_fs = not isinstance(slf_fs, SlfFS)
+    if owns_slf_fs:
+        slf_fs = SlfFS(slf_fs)
+    try:
+        if paths is None:
+            indices_by_path = slf_fs._entries_by_path.items()
+        else:
+            indices_by_path = []
+            for path in paths:
+                index = slf_fs._get_entry_index(path)
+                if index is None:
+                    raise ResourceNotFoundError(path)
+                indices_by_path.append((slf_fs._resolve_path(path), index))
+
+        offsets, lengths = slf_fs.entry_table.offsets, slf_fs.entry_table.lengths
+        plan = []
+        directories = set()
+        for path, index in sorted(indices_by_path, key=lambda p: offsets[p[1]]):
+            to_path = _get_extraction_path(destination, path)
+            directories.add(os.path.dirname(to_path))
+            plan.append((to_path, offsets[index], lengths[index]))
+        for directory in sorted(directories):
+            os.makedirs(directory, exist_ok=True)
+
+        def extract_file(to_path, offset, length):
+            with open(to_path, 'wb') as to_file:
+                slf_fs._copy_range_to(offset, length, to_file)
+
+        if jobs == 1:
+            for p in plan:
+                extract_file(*p)
+        else:
+            # The default of ThreadPoolExecutor is several threads per CPU
+            with ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) if jobs is None else jobs) as executor:
+                futures = list(executor.submit(extract_file, *p) for p in plan)
+                for future in futures:
+                    future.result()
+        return list(p[0] for p in plan)
+    finally:
+        if owns_slf_fs:
+            slf_fs.close()
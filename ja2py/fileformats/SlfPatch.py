@@ -0,0 +1,197 @@
+##############################################################################
+#
+# This file is part of JA2 Open Toolset
+#
+# JA2 Open Toolset is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# JA2 Open Toolset is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with JA2 Open Toolset.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+from .common import Ja2FileHeader
+from .SlfFS import SlfEntry, SlfHeader, COPY_CHUNK_SIZE, SLF_ENTRY_STATE_OK, SLF_ENTRY_STATE_DELETED
+
+SLF_PATCH_MAGIC = b'SLFPATCH'
+SLF_PATCH_VERSION = 2
+
+SLF_PATCH_COPY = 0
+SLF_PATCH_ADD = 1
+SLF_PATCH_CHANGE = 2
+SLF_PATCH_REMOVE = 3
+
+
+class SlfPatchException(Exception):
+    """Raised when a patch can not be read or does not apply to an SLF-file"""
+    pass
+
+
+class SlfPatchHeader(Ja2FileHeader):
+    """
+    Class Representation of the header at the top of every slf patch, it is followed by the SlfHeader of the target
+    """
+    fields = [
+        ('magic', '8s'),
+        ('version', 'H'),
+        (None, '2x'),
+        ('number_of_entries', 'I'),
+        ('number_of_removed', 'I'),
+    ]
+
+
+class SlfPatchRecord(Ja2FileHeader):
+    """
+    Class Representation of a single file in a slf patch, it is followed by the name of the file and, for added
+    and changed files, its contents. Times are stored as FILETIME, like in the SlfEntry. Copied files also store the
+    time of the file in the source, to check that the patch is applied to the right SLF-file.
+    """
+    fields = [
+        ('operation', 'B'),
+        (None, 'x'),
+        ('name_length', 'H'),
+        ('length', 'I'),
+        ('filetime', 'q'),
+        ('source_filetime', 'q'),
+    ]
+
+
+def _get_live_entries(slf_fs):
+    return list(e for e in slf_fs.entries if e['state'] != SLF_ENTRY_STATE_DELETED)
+
+
+def _get_entries_by_name(slf_fs):
+    entries_by_name = {}
+    for slf_entry in _get_live_entries(slf_fs):
+        entries_by_name.setdefault(slf_entry['file_name'], slf_entry)
+    return entries_by_name
+
+
+def _has_same_contents(source, source_entry, target, target_entry):
+    offset = 0
+    length = source_entry['length']
+    while offset < length:
+        size = min(length - offset, COPY_CHUNK_SIZE)
+        if (source._read(source_entry['offset'] + offset, size) !=
+                target._read(target_entry['offset'] + offset, size)):
+            return False
+        offset += size
+    return True
+
+
+def _write_record(patch_file, operation, name, length, filetime, source_filetime=0):
+    encoded_name = name.encode('ascii')
+    patch_file.write(bytes(SlfPatchRecord(operation=operation, name_length=len(encoded_name), length=length,
+                                          filetime=filetime, source_filetime=source_filetime)))
+    patch_file.write(encoded_name)
+
+
+def _read_exactly(file, size):
+    data = file.read(size)
+    if len(data) != size:
+        raise SlfPatchException('Unexpected end of patch')
+    return data
+
+
+def diff_slf(source, target, patch_file):
+    """
+    Writes a patch to `patch_file` that turns the SLF-file of SlfFS `source` into the one of SlfFS `target`
+
+    Files are matched by name. Files with the same length and time are considered unchanged, only files with the same
+    length and a different time are compared. The patch contains the contents of added and changed files only.
+    Returns the number of added, changed, removed and unchanged files as a dict.
+    """
+    source_entries = _get_entries_by_name(source)
+    target_entries = _get_live_entries(target)
+    target_names = set(e['file_name'] for e in target_entries)
+    removed = list(name for name in source_entries if name not in target_names)
+    summary = {'added': 0, 'changed': 0, 'removed': len(removed), 'unchanged': 0}
+
+    patch_file.write(bytes(SlfPatchHeader(magic=SLF_PATCH_MAGIC, version=SLF_PATCH_VERSION,
+                                          number_of_entries=len(target_entries), number_of_removed=len(removed))))
+    patch_file.write(bytes(target.header))
+
+    for target_entry in target_entries:
+        name = target_entry['file_name']
+        source_entry = source_entries.get(name)
+        if source_entry is None:
+            operation = SLF_PATCH_ADD
+            summary['added'] += 1
+        elif source_entry['length'] != target_entry['length']:
+            operation = SLF_PATCH_CHANGE
+            summary['changed'] += 1
+        elif (source_entry.filetime == target_entry.filetime or
+                _has_same_contents(source, source_entry, target, target_entry)):
+            operation = SLF_PATCH_COPY
+            summary['unchanged'] += 1
+        else:
+            operation = SLF_PATCH_CHANGE
+            summary['changed'] += 1
+
+        source_filetime = source_entry.filetime if operation == SLF_PATCH_COPY else 0
+        _write_record(patch_file, operation, name, target_entry['length'], target_entry.filetime, source_filetime)
+        if operation != SLF_PATCH_COPY:
+            target._copy_range_to(target_entry['offset'], target_entry['length'], patch_file)
+
+    for name in removed:
+        source_entry = source_entries[name]
+        _write_record(patch_file, SLF_PATCH_REMOVE, name, source_entry['length'], source_entry.filetime)
+
+    return summary
+
+
+def apply_slf_patch(source, patch_file, to_file):
+    """
+    Writes the SLF-file described by the patch in `patch_file` to `to_file`
+
+    Unchanged files are copied from the SLF-file of SlfFS `source` and the other files from the patch, both in chunks.
+    Raises SlfPatchException if the patch is invalid or was not created for `source`, which is detected by the length
+    and time of the copied files.
+    """
+    patch_header = SlfPatchHeader.from_bytes(_read_exactly(patch_file, SlfPatchHeader.get_size()))
+    if patch_header['magic'] != SLF_PATCH_MAGIC:
+        raise SlfPatchException('Not an slf patch')
+    if patch_header['version'] != SLF_PATCH_VERSION:
+        raise SlfPatchException('Unsupported slf patch version {0}'.format(patch_header['version']))
+    header = SlfHeader.from_bytes(_read_exactly(patch_file, SlfHeader.get_size()))
+    number_of_entries = patch_header['number_of_entries']
+    header['number_of_entries'] = number_of_entries
+    header['used'] = number_of_entries
+
+    source_entries = _get_entries_by_name(source)
+    to_file.write(bytes(header))
+
+    entries = []
+    offset = SlfHeader.get_size()
+    for _ in range(number_of_entries + patch_header['number_of_removed']):
+        record = SlfPatchRecord.from_bytes(_read_exactly(patch_file, SlfPatchRecord.get_size()))
+        name = _read_exactly(patch_file, record['name_length']).decode('ascii')
+        length = record['length']
+        if record['operation'] == SLF_PATCH_REMOVE:
+            continue
+        if record['operation'] == SLF_PATCH_COPY:
+            source_entry = source_entries.get(name)
+            if (source_entry is None or source_entry['length'] != length or
+                    source_entry.filetime != record['source_filetime']):
+                raise SlfPatchException('Patch does not apply, file {0} differs'.format(name))
+            source._copy_range_to(source_entry['offset'], length, to_file)
+        elif record['operation'] in (SLF_PATCH_ADD, SLF_PATCH_CHANGE):
+            remaining = length
+            while remaining > 0:
+                chunk = _read_exactly(patch_file, min(remaining, COPY_CHUNK_SIZE))
+                to_file.write(chunk)
+                remaining -= len(chunk)
+        else:
+            raise SlfPatchException('Invalid operation {0} in patch'.format(record['operation']))
+        entries.append(SlfEntry(file_name=name, offset=offset, length=length, filetime=record['filetime'],
+                                state=SLF_ENTRY_STATE_OK))
+        offset += length
+
+    to_file.write(b''.join(bytes(e) for e in entries))
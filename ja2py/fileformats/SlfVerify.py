@@ -0,0 +1,167 @@
+##############################################################################
+#
+# This file is part of JA2 Open Toolset
+#
+# JA2 Open Toolset is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# JA2 Open Toolset is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with JA2 Open Toolset.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+import os
+import itertools
+import struct
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from fs.errors import CreateFailedError
+
+from .SlfFS import SlfFS, SlfEntry, SlfHeader, SLF_ENTRY_STATE_DELETED
+from .Sti import is_8bit_sti, is_16bit_sti, load_8bit_sti, load_16bit_sti
+from .Gap import load_gap
+
+DECODE_BATCH_SIZE = 64
+
+SlfProblem = namedtuple('SlfProblem', ['file_name', 'message'])
+
+SlfVerification = namedtuple('SlfVerification', ['problems', 'number_of_decoded', 'decoded_size'])
+
+
+def _get_file_size(slf_fs):
+    if slf_fs._memory is not None:
+        return len(slf_fs._memory)
+    with slf_fs._lock:
+        return slf_fs.file.seek(0, os.SEEK_END)
+
+
+def _check_entries(slf_fs):
+    """Checks the header and the ranges of all entries, sorting the entries by offset to find overlaps"""
+    problems = []
+    header = slf_fs.header
+    number_of_entries = header['number_of_entries']
+    entry_table = slf_fs.entry_table
+    offsets, lengths = entry_table.offsets, entry_table.lengths
+    live_indices = list(i for i, state in enumerate(entry_table.states) if state != SLF_ENTRY_STATE_DELETED)
+
+    if number_of_entries < 0:
+        problems.append(SlfProblem(None, 'Header says there are {0} entries'.format(number_of_entries)))
+        number_of_entries = 0
+    elif header['used'] > number_of_entries:
+        problems.append(SlfProblem(None, 'Header says {0} entries are used, but there are only {1}'.format(
+            header['used'], number_of_entries)))
+    if header['used'] != len(live_indices):
+        problems.append(SlfProblem(None, 'Header says {0} entries are used, but {1} are'.format(
+            header['used'], len(live_indices))))
+    data_start = SlfHeader.get_size()
+    data_end = _get_file_size(slf_fs) - number_of_entries * SlfEntry.get_size()
+    if data_end < data_start:
+        problems.append(SlfProblem(None, 'Header says there are {0} entries, but the file is too small'.format(
+            number_of_entries)))
+
+    previous = None
+    end = data_start
+    for index in sorted(live_indices, key=lambda i: (offsets[i], lengths[i])):
+        offset, length = offsets[index], lengths[index]
+        if offset < data_start or offset + length > data_end:
+            problems.append(SlfProblem(entry_table.name(index), 'Range {0}-{1} is outside of the data {2}-{3}'.format(
+                offset, offset + length, data_start, data_end)))
+            continue
+        if length == 0:
+            continue
+        # Deduplicated entries share the same range
+        if offset < end and (offset, length) != previous:
+            problems.append(SlfProblem(entry_table.name(index), 'Range {0}-{1} overlaps another entry'.format(
+                offset, offset + length)))
+        previous = (offset, length)
+        end = max(end, offset + length)
+    return problems
+
+
+def _decode_member(slf_fs, path):
+    """Decodes a STI or GAP file, returns an error message or None"""
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        with slf_fs.open(path, 'rb') as f:
+            if extension == '.sti':
+                if is_8bit_sti(f):
+                    load_8bit_sti(f)
+                elif is_16bit_sti(f):
+                    load_16bit_sti(f)
+                else:
+                    return 'Unsupported STI file'
+            else:
+                load_gap(f)
+    except Exception as e:
+        return 'Can not be decoded ({0}: {1})'.format(e.__class__.__name__, e)
+    return None
+
+
+def _decode_members(slf_fs, paths):
+    problems = []
+    decoded_size = 0
+    for path in paths:
+        index = slf_fs._get_entry_index(path)
+        message = _decode_member(slf_fs, path)
+        if message is not None:
+            problems.append(SlfProblem(slf_fs.entry_table.name(index), message))
+        decoded_size += slf_fs.entry_table.lengths[index]
+    return problems, decoded_size
+
+
+# The SlfFS opened by a worker process, it is reused for all batches of the same SLF-file
+_process_slf_fs = None
+
+
+def _decode_members_in_process(slf_filename, paths):
+    global _process_slf_fs
+    if _process_slf_fs is None or _process_slf_fs.file_name != slf_filename:
+        if _process_slf_fs is not None:
+            _process_slf_fs.close()
+        _process_slf_fs = SlfFS(slf_filename, mmap=True)
+    return _decode_members(_process_slf_fs, paths)
+
+
+def verify_slf(slf_fs, decode=False, jobs=None):
+    """
+    Verifies an SLF-file, returns a SlfVerification with a list of SlfProblems
+
+    `slf_fs` is a SlfFS or the name of an SLF-file. The header and the ranges of all entries are checked first. With
+    `decode` all STI and GAP files are decoded as well. They are decoded by a pool of `jobs` processes (by default one
+    per CPU) if the SLF-file was opened by filename.
+    """
+    owns_slf_fs = not isinstance(slf_fs, SlfFS)
+    if owns_slf_fs:
+        try:
+            slf_fs = SlfFS(slf_fs)
+        except (CreateFailedError, OSError, ValueError, struct.error) as e:
+            return SlfVerification([SlfProblem(None, 'Can not be read ({0})'.format(e))], 0, 0)
+    try:
+        problems = _check_entries(slf_fs)
+        if not decode:
+            return SlfVerification(problems, 0, 0)
+
+        paths = sorted((p for p in slf_fs._entries_by_path if os.path.splitext(p)[1].lower() in ('.sti', '.gap')),
+                       key=lambda p: slf_fs.entry_table.offsets[slf_fs._entries_by_path[p]])
+        decoded_size = 0
+        if slf_fs._owns_file and jobs != 1:
+            batches = list(paths[i:i + DECODE_BATCH_SIZE] for i in range(0, len(paths), DECODE_BATCH_SIZE))
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                for batch_problems, batch_size in executor.map(_decode_members_in_process,
+                                                               itertools.repeat(slf_fs.file_name), batches):
+                    problems.extend(batch_problems)
+                    decoded_size += batch_size
+        else:
+            decode_problems, decoded_size = _decode_members(slf_fs, paths)
+            problems.extend(decode_problems)
+        return SlfVerification(problems, len(paths), decoded_size)
+    finally:
+        if owns_slf_fs:
+            slf_fs.close()
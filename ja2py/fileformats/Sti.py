@@ -25,7 +25,7 @@ from PIL import Image, ImageFile, ImagePalette
 
 from .common import Ja2FileHeader
 from ..content import Image16Bit, Images8Bit, SubImage8Bit
-from .ETRLE import etrle_decompress, etrle_compress
+from .ETRLE import EtrleDecoder, etrle_decompress_into, etrle_compress
 
 
 class Sti16BitHeader(Ja2FileHeader):
@@ -175,13 +175,18 @@ def load_16bit_sti(file):
 
 def _load_raw_sub_image(f, palette, sub_image_header):
     compressed_data = f.read(sub_image_header['length'])
-    uncompressed_data = etrle_decompress(compressed_data)
+    uncompressed_data = bytearray(sub_image_header['width'] * sub_image_header['height'])
+    # Like Image.frombytes, data beyond the image is ignored and missing data is an error
+    if etrle_decompress_into(compressed_data, uncompressed_data, truncate=True) != len(uncompressed_data):
+        raise ValueError('not enough image data')
 
-    img = Image.frombytes(
+    # The image uses the decompressed data without copying it
+    img = Image.frombuffer(
         'P',
         (sub_image_header['width'], sub_image_header['height']),
         uncompressed_data,
-        'raw'
+        'raw',
+        'P', 0, 1
     )
     img.putpalette(palette)
 
@@ -933,14 +938,18 @@ class StiImageDecoder(ImageFile.PyDecoder):
         elif self.do == 'etrle':
             self.transparent = args[1]
             self.bytes = args[2]
-            assert isinstance(self.transparent, int) and self.transparent == 0, "transparent index %r" % self.transparent # XXX etrle_decompress expects index 0
+            assert isinstance(self.transparent, int) and self.transparent == 0, "transparent index %r" % self.transparent # XXX EtrleDecoder expects index 0
             assert isinstance(self.bytes, int) and self.bytes >= 0, "number of bytes %r" % self.bytes
             assert self.mode == "P", "mode %r" % self.mode
+            self.etrle_decoder = None
+            self.raw_decoder = None
         else:
             raise NotImplementedError("decoder args {}".format(args))
 
     def decode(self, buffer):
         """Decodes buffer data as image pixels"""
+        if self.do == 'etrle':
+            return self._decode_etrle(buffer)
         # gather the target amount of data
         if self.bytes > len(buffer):
             self.data.extend(buffer)
@@ -983,12 +992,30 @@ class StiImageDecoder(ImageFile.PyDecoder):
         elif self.do == 'indexes': # uncompressed indexes
             self.set_as_raw(buffer)
             return -1, 1 # done
-        elif self.do == 'etrle': # etrle compressed indexes
-            buffer = bytes(etrle_decompress(self.data))
-            self.set_as_raw(buffer)
-            return -1, 1 # done
         raise NotImplementedError("do %r", self.do)
 
+    def _decode_etrle(self, buffer):
+        """Decodes etrle compressed indexes as they arrive, completed rows are passed on to a raw decoder"""
+        if self.etrle_decoder is None:
+            self.etrle_decoder = EtrleDecoder(self.state.xsize)
+            self.raw_decoder = Image._getdecoder(self.mode, 'raw', self.mode)
+            self.raw_decoder.setimage(self.im, self.state.extents())
+            self.raw_status = (0, 0)
+        consumed = min(len(buffer), self.bytes)
+        self.bytes -= consumed
+        rows = self.etrle_decoder.decode(memoryview(buffer)[:consumed])
+        if self.bytes == 0:
+            rows += self.etrle_decoder.flush()
+        if rows and self.raw_status[0] >= 0: # the raw decoder ignores rows after the last one
+            self.raw_status = self.raw_decoder.decode(rows)
+            if self.raw_status[1] != 0:
+                raise ValueError("cannot decode image data")
+        if self.bytes > 0:
+            return consumed, 0 # get more data
+        if self.raw_status[0] >= 0:
+            raise ValueError("not enough image data")
+        return -1, 1 # done
+
 
 # XXX ImageFile.PyEncoder does not exist
 class PyEncoder(object):
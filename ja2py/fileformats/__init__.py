@@ -17,9 +17,14 @@
 #
 ##############################################################################
 
-from .SlfFS import SlfFS, BufferedSlfFS, SlfEntry, SlfHeader
+from .SlfFS import SlfFS, BufferedSlfFS, SlfEntry, SlfEntryTable, SlfHeader, SlfCacheInfo, extract_slf
+from .DataFS import DataFS
+from .AsyncSlfFS import AsyncSlfFS
+from .SlfPatch import SlfPatchException, diff_slf, apply_slf_patch
+from .SlfVerify import SlfProblem, SlfVerification, verify_slf
 from .Sti import Sti16BitHeader, Sti8BitHeader, StiHeader, StiSubImageHeader, AuxObjectData,\
                  is_16bit_sti, is_8bit_sti, load_16bit_sti, load_8bit_sti, save_16bit_sti, save_8bit_sti
-from .ETRLE import EtrleException, etrle_compress, etrle_decompress
+from .ETRLE import EtrleException, EtrleDecoder, etrle_compress, etrle_decompress, etrle_decompress_into, \
+                   etrle_decompress_rows, etrle_row_offsets
 from .Gap import load_gap
 from .common import encode_ja2_string, decode_ja2_string, Ja2FileHeader
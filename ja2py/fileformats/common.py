@@ -41,7 +41,7 @@ class Ja2FileHeader(object):
             self[key] = value
 
     def __setitem__(self, key, value):
-        if key not in self.keys() or key is None:
+        if key not in self._get_key_set():
             raise KeyError('Invalid key {0}'.format(key))
         self.field_values[key] = value
 
@@ -51,7 +51,7 @@ class Ja2FileHeader(object):
     def __bytes__(self):
         raw_values = self.map_attrs_to_raw(self.field_values)
         ordered_raw_values = list(map(lambda k: raw_values[k], self.keys()))
-        return struct.pack(self._get_struct_format(), *ordered_raw_values)
+        return self._get_struct().pack(*ordered_raw_values)
 
     def get_flag(self, attr, flag_name):
         return (self[attr] >> self.flags[attr][flag_name]) & 1 == 1
@@ -80,15 +80,29 @@ class Ja2FileHeader(object):
     def keys(cls):
         return list([f[0] for f in cls.fields if f[0] is not None])
 
+    @classmethod
+    def _get_key_set(cls):
+        # Cached per class like the struct, it is checked for every field that is set
+        if '_key_set' not in cls.__dict__:
+            cls._key_set = frozenset(cls.keys())
+        return cls._key_set
+
     @classmethod
     def _get_struct_format(cls):
         return '<' + str.join('', map(lambda f: f[1], cls.fields))
 
+    @classmethod
+    def _get_struct(cls):
+        # Cached per class, subclasses may define different fields
+        if '_struct' not in cls.__dict__:
+            cls._struct = struct.Struct(cls._get_struct_format())
+        return cls._struct
+
     @classmethod
     def get_size(cls):
-        return struct.calcsize(cls._get_struct_format())
+        return cls._get_struct().size
 
     @classmethod
     def from_bytes(cls, byte_str):
-        kwargs = cls.map_raw_to_attrs(dict(zip(cls.keys(), struct.unpack(cls._get_struct_format(), byte_str))))
+        kwargs = cls.map_raw_to_attrs(dict(zip(cls.keys(), cls._get_struct().unpack(byte_str))))
         return cls(**kwargs)
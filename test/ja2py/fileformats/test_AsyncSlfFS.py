@@ -0,0 +1,55 @@
+import asyncio
+import unittest
+from tempfile import TemporaryDirectory
+from fs.errors import ResourceNotFoundError, ResourceInvalidError
+from ja2py.fileformats import SlfFS, AsyncSlfFS
+
+from .test_SlfFS import create_test_slf_fs, write_slf_file
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+class TestAsyncSlfFS(unittest.TestCase):
+    def test_read(self):
+        with AsyncSlfFS(SlfFS(create_test_slf_fs())) as async_fs:
+            self.assertEqual(run(async_fs.read('/spam/ham/parrot.txt')), b'Second')
+            self.assertEqual(run(async_fs.read('carrot')), b'Fourth')
+
+    def test_read_missing(self):
+        with AsyncSlfFS(SlfFS(create_test_slf_fs())) as async_fs:
+            with self.assertRaises(ResourceNotFoundError):
+                run(async_fs.read('/missing'))
+            with self.assertRaises(ResourceInvalidError):
+                run(async_fs.read('/spam'))
+
+    def test_read_many(self):
+        with AsyncSlfFS(SlfFS(create_test_slf_fs()), max_workers=2) as async_fs:
+            contents = run(async_fs.read_many(['/carrot', '/foo/bar.baz', '/spam/parrot.txt', '/carrot']))
+
+        self.assertEqual(contents, [b'Fourth', b'First', b'Third', b'Fourth'])
+
+    def test_read_from_file(self):
+        with TemporaryDirectory() as directory:
+            path = write_slf_file(directory, create_test_slf_fs())
+            for mmap in (False, True):
+                async_fs = AsyncSlfFS(path, mmap=mmap)
+                contents = run(async_fs.read_many(['/spam/ham/parrot.txt'] * 20))
+                async_fs.close()
+
+                self.assertEqual(contents, [b'Second'] * 20)
+                self.assertTrue(async_fs.slf_fs.closed)
+
+    def test_iterating_over_paths(self):
+        async def collect(async_fs):
+            paths = []
+            async with async_fs:
+                async for path in async_fs:
+                    paths.append(path)
+            self.assertTrue(async_fs._executor._shutdown)
+            return paths
+
+        paths = run(collect(AsyncSlfFS(SlfFS(create_test_slf_fs()))))
+
+        self.assertEqual(paths, ['/foo/bar.baz', '/spam/ham/parrot.txt', '/spam/parrot.txt', '/carrot'])
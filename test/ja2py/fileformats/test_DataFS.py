@@ -0,0 +1,126 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from fs.errors import CreateFailedError, UnsupportedError, ResourceNotFoundError, ResourceInvalidError
+from ja2py.fileformats import BufferedSlfFS, DataFS
+
+
+def write_slf(file_name, files):
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    slf_fs = BufferedSlfFS()
+    for path, contents in files.items():
+        directory = os.path.dirname(path)
+        if directory:
+            slf_fs.makedir(directory, recursive=True, allow_recreate=True)
+        slf_fs.setcontents(path, contents)
+    with open(file_name, 'wb') as file:
+        slf_fs.save(file)
+
+
+def write_file(file_name, contents):
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    with open(file_name, 'wb') as file:
+        file.write(contents)
+
+
+class TestDataFS(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = TemporaryDirectory()
+        self.data_directory = os.path.join(self.temporary_directory.name, 'Data')
+        self.mod_directory = os.path.join(self.temporary_directory.name, 'Mod')
+        write_slf(os.path.join(self.data_directory, 'Interface.slf'), {
+            '/button.sti': b'archive',
+            '/icons/info.sti': b'info',
+        })
+        write_slf(os.path.join(self.data_directory, 'Maps.slf'), {
+            '/a9.dat': b'map',
+        })
+        write_file(os.path.join(self.data_directory, 'Interface', 'button.sti'), b'loose')
+        write_file(os.path.join(self.data_directory, 'readme.txt'), b'readme')
+        write_slf(os.path.join(self.mod_directory, 'Interface.slf'), {
+            '/button.sti': b'mod archive',
+            '/icons/info.sti': b'mod info',
+        })
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def test_missing_data_directory(self):
+        with self.assertRaises(CreateFailedError):
+            DataFS(os.path.join(self.temporary_directory.name, 'Missing'))
+
+    def test_archives_are_mounted_at_their_name(self):
+        with DataFS(self.data_directory) as data_fs:
+            self.assertEqual(data_fs.getcontents('/Maps/a9.dat', 'rb'), b'map')
+            self.assertEqual(data_fs.getcontents('/Interface/icons/info.sti', 'rb'), b'info')
+            self.assertTrue(data_fs.isdir('/Interface/icons'))
+            self.assertTrue(data_fs.isfile('/readme.txt'))
+            self.assertFalse(data_fs.exists('/Maps/b9.dat'))
+
+    def test_archives_are_opened_on_first_access(self):
+        with DataFS(self.data_directory) as data_fs:
+            self.assertEqual(data_fs.getcontents('/readme.txt', 'rb'), b'readme')
+            self.assertEqual(data_fs._archives, [])
+            data_fs.isfile('/Maps/a9.dat')
+            self.assertEqual(len(data_fs._archives), 1)
+
+    def test_loose_files_take_precedence_over_archives(self):
+        with DataFS(self.data_directory) as data_fs:
+            self.assertEqual(data_fs.getcontents('/Interface/button.sti', 'rb'), b'loose')
+            self.assertIsNotNone(data_fs.getsyspath('/Interface/button.sti'))
+            self.assertIsNone(data_fs.getsyspath('/Interface/icons/info.sti', allow_none=True))
+
+    def test_mod_directories_take_precedence(self):
+        with DataFS(self.data_directory, [self.mod_directory]) as data_fs:
+            self.assertEqual(data_fs.getcontents('/Interface/button.sti', 'rb'), b'mod archive')
+            self.assertEqual(data_fs.getcontents('/Interface/icons/info.sti', 'rb'), b'mod info')
+            self.assertEqual(data_fs.getcontents('/Maps/a9.dat', 'rb'), b'map')
+            self.assertEqual(data_fs.getinfo('/Interface/button.sti')['size'], 11)
+
+    def test_listdir(self):
+        with DataFS(self.data_directory, [self.mod_directory]) as data_fs:
+            self.assertEqual(data_fs.listdir(), ['Interface', 'Maps', 'readme.txt'])
+            self.assertEqual(data_fs.listdir('/Interface'), ['button.sti', 'icons'])
+            self.assertEqual(data_fs.listdir('/Interface', dirs_only=True), ['icons'])
+            self.assertEqual(data_fs.listdir('/Interface/icons'), ['info.sti'])
+
+    def test_listdir_invalid(self):
+        with DataFS(self.data_directory) as data_fs:
+            with self.assertRaises(ResourceInvalidError):
+                data_fs.listdir('/readme.txt')
+            with self.assertRaises(ResourceNotFoundError):
+                data_fs.listdir('/Missing')
+
+    def test_open_missing(self):
+        with DataFS(self.data_directory) as data_fs:
+            with self.assertRaises(ResourceNotFoundError):
+                data_fs.open('/Maps/b9.dat', 'rb')
+            with self.assertRaises(ResourceInvalidError):
+                data_fs.open('/Maps', 'rb')
+
+    def test_writing_is_not_supported(self):
+        with DataFS(self.data_directory) as data_fs:
+            with self.assertRaises(UnsupportedError):
+                data_fs.open('/readme.txt', 'wb')
+            with self.assertRaises(UnsupportedError):
+                data_fs.remove('/readme.txt')
+            with self.assertRaises(UnsupportedError):
+                data_fs.makedir('/foo')
+
+    def test_case_insensitive_paths(self):
+        write_file(os.path.join(self.mod_directory, 'INTERFACE', 'Icons', 'INFO.STI'), b'loose info')
+        with DataFS(self.data_directory, [self.mod_directory], case_insensitive=True) as data_fs:
+            self.assertTrue(data_fs.getmeta('case_insensitive_paths'))
+            self.assertEqual(data_fs.getcontents('/interface/BUTTON.STI', 'rb'), b'mod archive')
+            self.assertEqual(data_fs.getcontents('/interface/icons/info.sti', 'rb'), b'loose info')
+            self.assertEqual(data_fs.getcontents('/MAPS/A9.dat', 'rb'), b'map')
+            self.assertTrue(data_fs.isfile('/README.TXT'))
+            self.assertTrue(data_fs.isdir('/interface/ICONS'))
+            self.assertEqual(data_fs.listdir('/'), ['Interface', 'Maps', 'readme.txt'])
+            self.assertEqual(data_fs.listdir('/interface/icons'), ['INFO.STI'])
+
+    def test_paths_are_case_sensitive_by_default(self):
+        with DataFS(self.data_directory) as data_fs:
+            self.assertFalse(data_fs.getmeta('case_insensitive_paths'))
+            self.assertFalse(data_fs.exists('/README.TXT'))
+            self.assertFalse(data_fs.exists('/maps/a9.dat'))
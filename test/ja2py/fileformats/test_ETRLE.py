@@ -1,5 +1,6 @@
 import unittest
-from ja2py.fileformats import etrle_compress, etrle_decompress, EtrleException
+from ja2py.fileformats import etrle_compress, etrle_decompress, etrle_decompress_into, etrle_decompress_rows, \
+                              etrle_row_offsets, EtrleDecoder, EtrleException
 
 COMPRESSED_FLAG = 0x80
 MAX_COMPR_BYTES = 127
@@ -42,6 +43,148 @@ class TestEtrleDecompress(unittest.TestCase):
     def test_not_enough_data(self):
         with self.assertRaises(EtrleException):
             etrle_decompress(bytes([0x02, 0x02]))
+        with self.assertRaises(EtrleException):
+            etrle_decompress(bytes([0x01, 0x02, COMPRESSED_FLAG | 0x02, 0x03, 0x04]))
+
+    def test_empty(self):
+        self.assertEqual(etrle_decompress(b''), b'')
+        self.assertEqual(etrle_decompress(bytes([0x00, COMPRESSED_FLAG])), b'')
+
+    def test_row_ends(self):
+        self.assertEqual(etrle_decompress(bytes([0x01, 0x02, 0x00, COMPRESSED_FLAG | 0x01, 0x00])), b'\x02\x00')
+
+    def test_buffers(self):
+        data = bytes([0x02, 0x02, 0x03, COMPRESSED_FLAG | 0x02])
+
+        self.assertEqual(etrle_decompress(bytearray(data)), b'\x02\x03\x00\x00')
+        self.assertEqual(etrle_decompress(memoryview(data)), b'\x02\x03\x00\x00')
+        self.assertIsInstance(etrle_decompress(bytearray(data)), bytes)
+
+
+class TestEtrleDecompressInto(unittest.TestCase):
+    def test_decompress_into(self):
+        out = bytearray(b'\xff' * 6)
+
+        self.assertEqual(etrle_decompress_into(bytes([0x02, 0x02, 0x03, COMPRESSED_FLAG | 0x02]), out), 4)
+        self.assertEqual(out, b'\x02\x03\x00\x00\xff\xff')
+
+    def test_offset(self):
+        out = bytearray(b'\xff' * 6)
+
+        self.assertEqual(etrle_decompress_into(bytes([0x02, 0x02, 0x03, COMPRESSED_FLAG | 0x02]), out, 2), 4)
+        self.assertEqual(out, b'\xff\xff\x02\x03\x00\x00')
+
+    def test_stride(self):
+        data = bytes([0x02, 0x01, 0x02, 0x00, COMPRESSED_FLAG | 0x01, 0x01, 0x03, 0x00])
+        out = bytearray(b'\xff' * 8)
+
+        self.assertEqual(etrle_decompress_into(data, out, out_offset=1, stride=4), 4)
+        self.assertEqual(out, b'\xff\x01\x02\xff\xff\x00\x03\xff')
+
+    def test_rows_without_stride_are_contiguous(self):
+        data = bytes([0x02, 0x01, 0x02, 0x00, COMPRESSED_FLAG | 0x01, 0x01, 0x03, 0x00])
+        out = bytearray(4)
+
+        self.assertEqual(etrle_decompress_into(data, out), 4)
+        self.assertEqual(out, etrle_decompress(data))
+
+    def test_memoryview(self):
+        out = bytearray(4)
+
+        etrle_decompress_into(bytes([0x02, 0x02, 0x03]), memoryview(out)[1:])
+        self.assertEqual(out, b'\x00\x02\x03\x00')
+
+    def test_not_enough_space(self):
+        with self.assertRaises(EtrleException):
+            etrle_decompress_into(bytes([0x02, 0x02, 0x03]), bytearray(1))
+        with self.assertRaises(EtrleException):
+            etrle_decompress_into(bytes([COMPRESSED_FLAG | 0x02]), bytearray(2), 1)
+
+    def test_not_enough_data(self):
+        with self.assertRaises(EtrleException):
+            etrle_decompress_into(bytes([0x02, 0x02]), bytearray(2))
+
+    def test_truncate(self):
+        out = bytearray(3)
+
+        self.assertEqual(etrle_decompress_into(bytes([0x02, 0x02, 0x03, 0x02, 0x04, 0x05]), out, truncate=True), 3)
+        self.assertEqual(out, b'\x02\x03\x04')
+        self.assertEqual(etrle_decompress_into(bytes([COMPRESSED_FLAG | 0x04]), out, 1, truncate=True), 2)
+        self.assertEqual(out, b'\x02\x00\x00')
+
+
+class TestEtrleDecoder(unittest.TestCase):
+    def test_chunks(self):
+        data = bytes([0x02, 0x01, 0x02, COMPRESSED_FLAG | 0x03, 0x00, 0x03, 0x04, 0x05, 0x06, 0x00])
+
+        for chunk_size in range(1, len(data) + 1):
+            decoder = EtrleDecoder()
+            decompressed = b''.join(decoder.decode(data[i:i + chunk_size]) for i in range(0, len(data), chunk_size))
+            self.assertEqual(decompressed + decoder.flush(), etrle_decompress(data))
+
+    def test_rows(self):
+        decoder = EtrleDecoder(width=3)
+
+        self.assertEqual(decoder.decode(bytes([0x02, 0x01, 0x02])), b'')
+        self.assertEqual(decoder.decode(bytes([COMPRESSED_FLAG | 0x04, 0x00, 0x01])), b'\x01\x02\x00\x00\x00\x00')
+        self.assertEqual(decoder.decode(bytes([0x07])), b'')
+        self.assertEqual(decoder.decode(bytes([0x02, 0x08, 0x09, 0x00])), b'\x07\x08\x09')
+        self.assertEqual(decoder.flush(), b'')
+
+    def test_incomplete_row(self):
+        decoder = EtrleDecoder(width=4)
+
+        self.assertEqual(decoder.decode(bytes([0x02, 0x01, 0x02])), b'')
+        self.assertEqual(decoder.flush(), b'\x01\x02')
+
+    def test_not_enough_data(self):
+        decoder = EtrleDecoder()
+        decoder.decode(bytes([0x03, 0x01]))
+
+        with self.assertRaises(EtrleException):
+            decoder.flush()
+
+
+class TestEtrleRows(unittest.TestCase):
+    # Rows of three pixels: 01 02 00, 00 00 00, 03 00 00
+    DATA = bytes([0x02, 0x01, 0x02, COMPRESSED_FLAG | 0x01, 0x00,
+                  COMPRESSED_FLAG | 0x03, 0x00,
+                  0x01, 0x03, COMPRESSED_FLAG | 0x02, 0x00])
+
+    def test_row_offsets(self):
+        self.assertEqual(etrle_row_offsets(self.DATA), [0, 5, 7])
+        self.assertEqual(etrle_row_offsets(b''), [])
+
+    def test_row_offsets_without_last_row_end(self):
+        self.assertEqual(etrle_row_offsets(self.DATA[:-1]), [0, 5, 7])
+        self.assertEqual(etrle_row_offsets(bytes([0x00, 0x00])), [0, 1])
+
+    def test_row_offsets_not_enough_data(self):
+        with self.assertRaises(EtrleException):
+            etrle_row_offsets(bytes([0x00, 0x03, 0x01]))
+
+    def test_decompress_rows(self):
+        self.assertEqual(etrle_decompress_rows(self.DATA, 3, 0, 3), etrle_decompress(self.DATA))
+        self.assertEqual(etrle_decompress_rows(self.DATA, 3, 1, 2), b'\x00\x00\x00')
+        self.assertEqual(etrle_decompress_rows(self.DATA, 3, 1, 3), b'\x00\x00\x00\x03\x00\x00')
+        self.assertEqual(etrle_decompress_rows(self.DATA, 3, 2, 2), b'')
+
+    def test_decompress_rows_with_offsets(self):
+        row_offsets = etrle_row_offsets(self.DATA)
+
+        self.assertEqual(etrle_decompress_rows(self.DATA, 3, 2, 3, row_offsets), b'\x03\x00\x00')
+
+    def test_decompress_invalid_rows(self):
+        with self.assertRaises(ValueError):
+            etrle_decompress_rows(self.DATA, 3, 2, 4)
+        with self.assertRaises(ValueError):
+            etrle_decompress_rows(self.DATA, 3, 2, 1)
+
+    def test_decompress_rows_wrong_width(self):
+        with self.assertRaises(EtrleException):
+            etrle_decompress_rows(self.DATA, 4, 0, 3)
+        with self.assertRaises(EtrleException):
+            etrle_decompress_rows(self.DATA, 2, 0, 3)
 
 
 class TestEtrleCompress(unittest.TestCase):
@@ -68,6 +211,21 @@ class TestEtrleCompress(unittest.TestCase):
         self.assertEqual(etrle_compress(b'\x00\x00\x00\x01\x02\x03'), b'\x83\x03\x01\x02\x03')
         self.assertEqual(etrle_compress(b'\x00\x01\x02\x00\x00'), b'\x81\x02\x01\x02\x82')
 
+    def test_long_runs(self):
+        data = 130 * b'\x01' + 300 * b'\x00' + b'\x02'
+        expected = (b'\x7f' + MAX_COMPR_BYTES * b'\x01' + b'\x03' + 3 * b'\x01' +
+                    bytes([COMPRESSED_FLAG | MAX_COMPR_BYTES, COMPRESSED_FLAG | MAX_COMPR_BYTES, COMPRESSED_FLAG | 46]) +
+                    b'\x01\x02')
+
+        self.assertEqual(etrle_compress(data), expected)
+
+    def test_empty(self):
+        self.assertEqual(etrle_compress(b''), b'')
+
+    def test_buffers(self):
+        self.assertEqual(etrle_compress(bytearray(b'\x01\x00')), b'\x01\x01\x81')
+        self.assertEqual(etrle_compress(memoryview(b'\x01\x00')), b'\x01\x01\x81')
+
 
 class TestEtrleRoundTrip(unittest.TestCase):
     def test_decompress_compress(self):
@@ -1,10 +1,22 @@
+import io
+import os
 import unittest
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from importlib import import_module
 from io import BytesIO
+from mock import patch
+from PIL import Image, ImagePalette
+from tempfile import TemporaryDirectory
 from time import strptime
-from fs.errors import CreateFailedError, UnsupportedError, ResourceNotFoundError, ResourceInvalidError
-from ja2py.fileformats import SlfEntry, SlfHeader, SlfFS, BufferedSlfFS
+from fs.errors import CreateFailedError, UnsupportedError, ResourceNotFoundError, ResourceInvalidError, \
+                      DirectoryNotEmptyError, BackReferenceError
+from ja2py.content import Images8Bit, SubImage8Bit
+from ja2py.fileformats import load_8bit_sti, save_8bit_sti, SlfEntry, SlfEntryTable, SlfHeader, SlfFS, BufferedSlfFS, SlfCacheInfo, extract_slf
+
+# The SlfFS class shadows its module in the package
+slf_module = import_module('ja2py.fileformats.SlfFS')
 
 class TestSlfFSEntry(unittest.TestCase):
     def test_size(self):
@@ -43,6 +55,43 @@ class TestSlfFSEntry(unittest.TestCase):
         self.assertEqual(regenerated_header['state'], 125)
         self.assertEqual(header['time'], time)
 
+    def test_time_is_converted_on_access(self):
+        test_bytes = bytes(SlfEntry(file_name='foo', offset=1, length=2, state=0, filetime=0x01d186bc18e3a200))
+
+        with patch.object(slf_module, '_filetime_to_time', wraps=slf_module._filetime_to_time) as filetime_to_time:
+            header = SlfEntry.from_bytes(test_bytes)
+            self.assertEqual(header['file_name'], 'foo')
+            self.assertEqual(filetime_to_time.call_count, 0)
+
+            self.assertEqual(header['time'], strptime('20160325T173100UTC', "%Y%m%dT%H%M%S%Z"))
+            self.assertEqual(header['time'], strptime('20160325T173100UTC', "%Y%m%dT%H%M%S%Z"))
+            self.assertEqual(filetime_to_time.call_count, 1)
+
+    def test_filetime_round_trip_is_lossless(self):
+        # Not a whole second, which is lost when converting to a struct_time
+        filetime = 0x01d186bc18e3a200 + 1234567
+        test_bytes = bytes(SlfEntry(file_name='foo', offset=1, length=2, state=0, filetime=filetime))
+
+        with patch.object(slf_module, '_time_to_filetime') as time_to_filetime:
+            header = SlfEntry.from_bytes(test_bytes)
+            header['time']
+            header['state'] = 0xFF
+
+            self.assertEqual(header.filetime, filetime)
+            self.assertEqual(bytes(header)[264], 0xFF)
+            self.assertEqual(bytes(header)[268:276], test_bytes[268:276])
+            self.assertEqual(time_to_filetime.call_count, 0)
+
+    def test_setting_time_replaces_filetime(self):
+        time = strptime('19900101T010000UTC', "%Y%m%dT%H%M%S%Z")
+        header = SlfEntry(file_name='foo', offset=1, length=2, state=0, filetime=131034918601234567)
+
+        header['time'] = time
+
+        self.assertEqual(header['time'], time)
+        self.assertEqual(header.filetime, 0x01b41e327a9aa800)
+        self.assertEqual(SlfEntry.from_bytes(bytes(header))['time'], time)
+
 
 class TestSlfFSHeader(unittest.TestCase):
     def test_size(self):
@@ -99,6 +148,66 @@ class TestSlfFSHeader(unittest.TestCase):
         self.assertEqual(regenerated_header['contains_subdirectories'], 12)
 
 
+class TestSlfFSEntryTable(unittest.TestCase):
+    def setUp(self):
+        self.entries = [
+            SlfEntry(file_name='foo\\bar.sti', offset=532, length=5, state=0,
+                     time=strptime('20160325T173100UTC', "%Y%m%dT%H%M%S%Z")),
+            SlfEntry(file_name='deleted', offset=537, length=0, state=0xFF,
+                     time=strptime('19900101T010000UTC', "%Y%m%dT%H%M%S%Z")),
+            SlfEntry(file_name='', offset=0xFFFFFFFF, length=7, state=1,
+                     time=strptime('20200325T183100UTC', "%Y%m%dT%H%M%S%Z")),
+        ]
+        self.entry_bytes = b''.join(bytes(e) for e in self.entries)
+
+    def assertEntriesEqual(self, entries, expected):
+        self.assertEqual(list(e.field_values for e in entries), list(e.field_values for e in expected))
+
+    def test_from_bytes(self):
+        table = SlfEntryTable.from_bytes(self.entry_bytes)
+
+        self.assertEqual(len(table), 3)
+        self.assertEntriesEqual(table, self.entries)
+        self.assertEqual(list(table.offsets), [532, 537, 0xFFFFFFFF])
+        self.assertEqual(list(table.states), [0, 0xFF, 1])
+
+    def test_from_entries(self):
+        table = SlfEntryTable.from_entries(self.entries)
+
+        self.assertEntriesEqual(table, self.entries)
+        self.assertEqual(b''.join(bytes(e) for e in table), self.entry_bytes)
+
+    def test_empty(self):
+        table = SlfEntryTable.from_bytes(b'')
+
+        self.assertEqual(len(table), 0)
+        self.assertEqual(table.names(), [])
+        self.assertEqual(list(table), [])
+
+    def test_names(self):
+        table = SlfEntryTable.from_bytes(self.entry_bytes)
+
+        self.assertEqual(table.names(), ['foo\\bar.sti', 'deleted', ''])
+        self.assertEqual(table.name(1), 'deleted')
+        self.assertEqual(table.name(2), '')
+
+    def test_indexing(self):
+        table = SlfEntryTable.from_bytes(self.entry_bytes)
+
+        self.assertEqual(table[-1]['length'], 7)
+        self.assertEqual(table.time(0), self.entries[0]['time'])
+        self.assertEntriesEqual(table[1:], self.entries[1:])
+        with self.assertRaises(IndexError):
+            table[3]
+
+    def test_column_bytes_round_trip(self):
+        table = SlfEntryTable.from_bytes(self.entry_bytes)
+
+        restored = SlfEntryTable._from_column_bytes(table.names(), len(table), table._get_column_bytes())
+
+        self.assertEntriesEqual(restored, self.entries)
+
+
 def create_test_slf_fs():
     time = strptime('19900101T010000UTC', "%Y%m%dT%H%M%S%Z")
     header = SlfHeader(
@@ -150,6 +259,13 @@ def create_slf_fs_with_directory_conflict(reversed=False):
     return BytesIO(bytes(header) + first_data + second_data + b''.join(entries))
 
 
+def write_slf_file(directory, slf_bytes):
+    path = os.path.join(directory, 'test.slf')
+    with open(path, 'wb') as f:
+        f.write(slf_bytes.getvalue())
+    return path
+
+
 class TestSlfFS(unittest.TestCase):
     def test_library_name(self):
         slf_file = SlfFS(create_test_slf_fs())
@@ -159,6 +275,22 @@ class TestSlfFS(unittest.TestCase):
         self.assertEqual(slf_file.sort, 1)
         self.assertEqual(slf_file.version, 1)
 
+    def test_reading_entries(self):
+        slf_file = SlfFS(create_test_slf_fs())
+
+        self.assertEqual(len(slf_file.entries), 4)
+        self.assertEqual([e['file_name'] for e in slf_file.entries],
+                         ['foo\\bar.baz', 'spam\\ham\\parrot.txt', 'spam\\parrot.txt', 'carrot'])
+        self.assertEqual([e['length'] for e in slf_file.entries], [5, 6, 5, 6])
+
+    def test_reading_empty_library(self):
+        header = SlfHeader(library_name='Empty', library_path='Empty', number_of_entries=0, used=0, sort=1,
+                           version=1, contains_subdirectories=0)
+        slf_file = SlfFS(BytesIO(bytes(header)))
+
+        self.assertEqual(slf_file.entries, [])
+        self.assertEqual(slf_file.listdir('/'), [])
+
     def test_reading_directory_structure(self):
         slf_file = SlfFS(create_test_slf_fs())
 
@@ -195,6 +327,26 @@ class TestSlfFS(unittest.TestCase):
         with slf_file.open('/foo_DIRECTORY_CONFLICT', 'rb') as f:
             self.assertEqual(f.read(), b'Second')
 
+    def test_directory_conflict_lookup(self):
+        slf_file = SlfFS(create_slf_fs_with_directory_conflict())
+
+        self.assertFalse(slf_file.isfile('/foo'))
+        self.assertTrue(slf_file.exists('/foo_DIRECTORY_CONFLICT'))
+        self.assertEqual(slf_file.getinfo('/foo_DIRECTORY_CONFLICT')['size'], 6)
+        self.assertFalse(slf_file.exists('/foo/bar_DIRECTORY_CONFLICT'))
+        with self.assertRaises(ResourceInvalidError):
+            slf_file.open('/foo', 'rb')
+
+    def test_lookup_of_non_normalized_paths(self):
+        slf_file = SlfFS(create_test_slf_fs())
+
+        self.assertTrue(slf_file.isfile('spam/ham/parrot.txt'))
+        self.assertTrue(slf_file.isfile('/spam//ham/../parrot.txt'))
+        self.assertTrue(slf_file.isdir('spam/ham/'))
+        self.assertTrue(slf_file.exists('foo'))
+        self.assertFalse(slf_file.exists('/spam/eggs'))
+        self.assertEqual(slf_file.open('foo/bar.baz', 'rb').read(), b'First')
+
     def test_listing_directory(self):
         slf_file = SlfFS(create_test_slf_fs())
 
@@ -203,6 +355,38 @@ class TestSlfFS(unittest.TestCase):
         self.assertEqual(set(slf_file.listdir('/spam')), {'parrot.txt', 'ham'})
         self.assertEqual(set(slf_file.listdir('/spam/ham')), {'parrot.txt'})
 
+    def test_listing_directory_with_filters(self):
+        slf_file = SlfFS(create_test_slf_fs())
+
+        self.assertEqual(slf_file.listdir('/spam', dirs_only=True), ['ham'])
+        self.assertEqual(slf_file.listdir('/spam', files_only=True), ['parrot.txt'])
+        self.assertEqual(slf_file.listdir('/', wildcard='*rr*'), ['carrot'])
+        self.assertEqual(slf_file.listdir('spam', full=True), ['spam/ham', 'spam/parrot.txt'])
+        self.assertEqual(slf_file.listdir('spam', absolute=True), ['/spam/ham', '/spam/parrot.txt'])
+
+    def test_listing_directory_with_conflict(self):
+        slf_file = SlfFS(create_slf_fs_with_directory_conflict())
+
+        self.assertEqual(slf_file.listdir('/'), ['foo', 'foo_DIRECTORY_CONFLICT'])
+        self.assertEqual(slf_file.listdir('/', files_only=True), ['foo_DIRECTORY_CONFLICT'])
+        self.assertEqual(slf_file.listdir('/foo'), ['bar'])
+
+    def test_listing_invalid_directory(self):
+        slf_file = SlfFS(create_test_slf_fs())
+
+        with self.assertRaises(ResourceNotFoundError):
+            slf_file.listdir('/eggs')
+        with self.assertRaises(ResourceInvalidError):
+            slf_file.listdir('/carrot')
+
+    def test_directory_contents_are_collected_lazily(self):
+        slf_file = SlfFS(create_test_slf_fs())
+
+        self.assertEqual(slf_file.open('/foo/bar.baz', 'rb').read(), b'First')
+        self.assertIsNone(slf_file._directory_contents)
+        slf_file.listdir('/')
+        self.assertIsNotNone(slf_file._directory_contents)
+
     def test_file_info(self):
         time = strptime('19900101T010000UTC', "%Y%m%dT%H%M%S%Z")
         slf_file = SlfFS(create_test_slf_fs())
@@ -258,6 +442,505 @@ class TestSlfFS(unittest.TestCase):
             slf_file.rename('/carrot', '/parrot')
 
 
+    def test_deleted_entries_are_skipped(self):
+        time = strptime('19900101T010000UTC', "%Y%m%dT%H%M%S%Z")
+        header = SlfHeader(library_name='SomeFile', library_path='SomePath', number_of_entries=2, used=1, sort=1,
+                           version=1, contains_subdirectories=0)
+        data_offset = SlfHeader.get_size()
+        deleted_entry = SlfEntry(file_name='foo', offset=data_offset, length=3, state=0xFF, time=time)
+        entry = SlfEntry(file_name='foo', offset=data_offset + 3, length=3, state=0, time=time)
+        slf_file = SlfFS(BytesIO(bytes(header) + b'Old' + b'New' + bytes(deleted_entry) + bytes(entry)))
+
+        self.assertEqual(len(slf_file.entries), 2)
+        self.assertEqual(slf_file.listdir('/'), ['foo'])
+        self.assertEqual(slf_file.open('/foo', 'rb').read(), b'New')
+
+    def test_paths_are_case_sensitive_by_default(self):
+        slf_file = SlfFS(create_test_slf_fs())
+
+        self.assertFalse(slf_file.getmeta('case_insensitive_paths'))
+        self.assertFalse(slf_file.isfile('/FOO/BAR.BAZ'))
+        self.assertFalse(slf_file.isdir('/SPAM'))
+
+    def test_case_insensitive_paths(self):
+        slf_file = SlfFS(create_test_slf_fs(), case_insensitive=True)
+
+        self.assertTrue(slf_file.getmeta('case_insensitive_paths'))
+        self.assertTrue(slf_file.isfile('/FOO/BAR.BAZ'))
+        self.assertTrue(slf_file.exists('Spam/Ham/Parrot.TXT'))
+        self.assertTrue(slf_file.isdir('/SPAM/ham'))
+        self.assertFalse(slf_file.isfile('/SPAM'))
+        self.assertEqual(slf_file.open('/Spam/Parrot.txt', 'rb').read(), b'Third')
+        self.assertEqual(slf_file.getinfo('/CARROT')['size'], 6)
+        self.assertEqual(slf_file.listdir('/SPAM'), ['ham', 'parrot.txt'])
+
+    def test_case_insensitive_directories_are_merged(self):
+        time = strptime('19900101T010000UTC', "%Y%m%dT%H%M%S%Z")
+        header = SlfHeader(library_name='SomeFile', library_path='SomePath', number_of_entries=3, used=3, sort=1,
+                           version=1, contains_subdirectories=1)
+        data_offset = SlfHeader.get_size()
+        entries = [
+            SlfEntry(file_name='FOO\\a', offset=data_offset, length=1, state=1, time=time),
+            SlfEntry(file_name='foo\\b', offset=data_offset + 1, length=1, state=1, time=time),
+            SlfEntry(file_name='Foo\\Bar\\C', offset=data_offset + 2, length=1, state=1, time=time),
+        ]
+        slf_file = SlfFS(BytesIO(bytes(header) + b'abc' + b''.join(bytes(e) for e in entries)), case_insensitive=True)
+
+        self.assertEqual(slf_file.listdir('/'), ['FOO'])
+        self.assertEqual(slf_file.listdir('/foo'), ['Bar', 'a', 'b'])
+        self.assertEqual(list(slf_file.walkfiles('/')), ['/FOO/a', '/FOO/b', '/FOO/Bar/C'])
+        self.assertEqual(slf_file.getcontents('/foo/B', 'rb'), b'b')
+        self.assertEqual(slf_file.getcontents('/foo/bar/c', 'rb'), b'c')
+
+
+class TestSlfFSWindowedFiles(unittest.TestCase):
+    def assert_windowed_reads(self, slf_file):
+        with slf_file.open('/spam/ham/parrot.txt', 'rb') as f:
+            self.assertEqual(f.read(2), b'Se')
+            buffer = bytearray(3)
+            self.assertEqual(f.readinto(buffer), 3)
+            self.assertEqual(buffer, b'con')
+            self.assertEqual(f.readinto(buffer), 1)
+            self.assertEqual(buffer[:1], b'd')
+            self.assertEqual(f.read(), b'')
+            self.assertEqual(f.seek(-4, os.SEEK_END), 2)
+            self.assertEqual(f.read(), b'cond')
+            f.seek(100)
+            self.assertEqual(f.read(1), b'')
+            f.seek(1)
+            self.assertEqual(f.tell(), 1)
+            self.assertEqual(f.read(100), b'econd')
+        with self.assertRaises(ValueError):
+            f.read()
+
+    def test_reading_from_file_like(self):
+        self.assert_windowed_reads(SlfFS(create_test_slf_fs()))
+
+    def test_reading_from_file_like_without_readinto(self):
+        class ReadOnlyFile(object):
+            def __init__(self, data):
+                self.read = data.read
+                self.seek = data.seek
+
+        self.assert_windowed_reads(SlfFS(ReadOnlyFile(create_test_slf_fs())))
+
+    def test_reading_from_file(self):
+        with TemporaryDirectory() as directory:
+            slf_file = SlfFS(write_slf_file(directory, create_test_slf_fs()))
+            self.assert_windowed_reads(slf_file)
+            slf_file.close()
+
+    def test_reading_only_touches_the_file(self):
+        slf_bytes = create_test_slf_fs()
+        slf_file = SlfFS(slf_bytes)
+
+        with patch.object(slf_bytes, 'readinto', wraps=slf_bytes.readinto) as readinto:
+            with slf_file.open('/carrot', 'rb', buffering=4) as f:
+                self.assertEqual(f.read(2), b'Fo')
+            self.assertEqual(len(readinto.call_args[0][0]), 4)
+        with patch.object(slf_bytes, 'readinto', wraps=slf_bytes.readinto) as readinto:
+            with slf_file.open('/carrot', 'rb') as f:
+                self.assertEqual(f.read(2), b'Fo')
+            self.assertEqual(len(readinto.call_args[0][0]), 6)
+
+    def test_loading_sti_reads_in_blocks(self):
+        palette = ImagePalette.ImagePalette('RGB', bytes(range(256)) * 3, 768)
+        images = []
+        for i in range(200):
+            image = Image.new('P', (16, 16))
+            image.putdata(list((i + p) % 7 for p in range(256)))
+            images.append(SubImage8Bit(image))
+        sti = BytesIO()
+        save_8bit_sti(Images8Bit(images, palette=palette, width=16, height=16), sti)
+        slf_fs = BufferedSlfFS()
+        slf_fs.setcontents('/many.sti', sti.getvalue())
+
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'test.slf')
+            with open(path, 'wb') as f:
+                slf_fs.save(f)
+            slf_file = SlfFS(path)
+
+            with patch.object(slf_file, '_read_into', wraps=slf_file._read_into) as read_into:
+                with slf_file.open('/many.sti', 'rb') as f:
+                    self.assertEqual(len(load_8bit_sti(f).images), 200)
+            slf_file.close()
+
+        self.assertLessEqual(read_into.call_count, len(sti.getvalue()) // io.DEFAULT_BUFFER_SIZE + 3)
+
+
+class TestSlfFSBatchReads(unittest.TestCase):
+    def test_iterating_over_all_members(self):
+        slf_file = SlfFS(create_test_slf_fs())
+
+        self.assertEqual(list(slf_file.iter_members()), [
+            ('/foo/bar.baz', b'First'),
+            ('/spam/ham/parrot.txt', b'Second'),
+            ('/spam/parrot.txt', b'Third'),
+            ('/carrot', b'Fourth'),
+        ])
+
+    def test_iterating_over_some_members(self):
+        slf_file = SlfFS(create_test_slf_fs())
+        paths = ['carrot', '/foo/bar.baz', '/spam/parrot.txt']
+
+        self.assertEqual(list(slf_file.iter_members(paths)),
+                         [('/foo/bar.baz', b'First'), ('/spam/parrot.txt', b'Third'), ('carrot', b'Fourth')])
+        self.assertEqual(list(slf_file.iter_members(paths, order=None)),
+                         [('carrot', b'Fourth'), ('/foo/bar.baz', b'First'), ('/spam/parrot.txt', b'Third')])
+        with self.assertRaises(ValueError):
+            list(slf_file.iter_members(paths, order='name'))
+
+    def test_iterating_over_missing_members(self):
+        slf_file = SlfFS(create_test_slf_fs())
+
+        with self.assertRaises(ResourceNotFoundError):
+            slf_file.iter_members(['/carrot', '/missing'])
+        with self.assertRaises(ResourceInvalidError):
+            slf_file.iter_members(['/spam'])
+
+    def test_adjacent_members_are_read_at_once(self):
+        slf_file = SlfFS(create_test_slf_fs())
+
+        with patch.object(slf_file, '_read', wraps=slf_file._read) as read:
+            contents = slf_file.read_many(['/carrot', '/spam/parrot.txt', '/foo/bar.baz', '/carrot'])
+
+        self.assertEqual(contents, [b'Fourth', b'Third', b'First', b'Fourth'])
+        read.assert_called_once_with(SlfHeader.get_size(), 22)
+
+    def test_distant_members_are_read_separately(self):
+        slf_file = SlfFS(create_test_slf_fs())
+
+        with patch.object(slf_module, 'READ_BATCH_GAP', 4):
+            with patch.object(slf_file, '_read', wraps=slf_file._read) as read:
+                contents = slf_file.read_many(['/carrot', '/foo/bar.baz'])
+            self.assertEqual(contents, [b'Fourth', b'First'])
+            self.assertEqual(read.call_count, 2)
+
+        with patch.object(slf_module, 'READ_BATCH_SIZE', 11):
+            with patch.object(slf_file, '_read', wraps=slf_file._read) as read:
+                contents = slf_file.read_many(['/carrot', '/foo/bar.baz', '/spam/parrot.txt', '/spam/ham/parrot.txt'])
+            self.assertEqual(contents, [b'Fourth', b'First', b'Third', b'Second'])
+            self.assertEqual(read.call_count, 2)
+
+    def test_reading_from_file(self):
+        with TemporaryDirectory() as directory:
+            for mmap in (False, True):
+                slf_file = SlfFS(write_slf_file(directory, create_test_slf_fs()), mmap=mmap)
+
+                self.assertEqual(slf_file.read_many(['/spam/ham/parrot.txt', '/carrot']), [b'Second', b'Fourth'])
+                self.assertEqual(len(list(slf_file.iter_members())), 4)
+                slf_file.close()
+
+    @unittest.skipUnless(hasattr(os, 'posix_fadvise'), 'posix_fadvise is not supported')
+    def test_reading_from_file_advises_readahead(self):
+        with TemporaryDirectory() as directory:
+            slf_file = SlfFS(write_slf_file(directory, create_test_slf_fs()))
+
+            with patch.object(slf_module, 'READ_BATCH_GAP', 4):
+                with patch('os.posix_fadvise') as posix_fadvise:
+                    self.assertEqual(slf_file.read_many(['/carrot', '/foo/bar.baz']), [b'Fourth', b'First'])
+            slf_file.close()
+
+        self.assertEqual(posix_fadvise.call_args_list[0][0][1:], (SlfHeader.get_size(), 5, os.POSIX_FADV_WILLNEED))
+        self.assertEqual(posix_fadvise.call_args_list[1][0][1:],
+                         (SlfHeader.get_size() + 16, 6, os.POSIX_FADV_WILLNEED))
+
+    @unittest.skipUnless(hasattr(os, 'posix_fadvise'), 'posix_fadvise is not supported')
+    def test_reading_empty_files_does_not_advise_readahead(self):
+        slf_fs = BufferedSlfFS()
+        slf_fs.setcontents('/empty', b'')
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'test.slf')
+            with open(path, 'wb') as f:
+                slf_fs.save(f)
+            slf_file = SlfFS(path)
+
+            with patch('os.posix_fadvise') as posix_fadvise:
+                self.assertEqual(slf_file.read_many(['/empty']), [b''])
+            slf_file.close()
+
+        posix_fadvise.assert_not_called()
+
+
+class TestSlfFSCache(unittest.TestCase):
+    def test_no_cache_by_default(self):
+        self.assertIsNone(SlfFS(create_test_slf_fs()).cache_info())
+        self.assertIsNone(BufferedSlfFS().cache_info())
+
+    def test_hits_and_misses(self):
+        slf_file = SlfFS(create_test_slf_fs(), cache_size=100)
+
+        self.assertEqual(slf_file.getcontents('/carrot', 'rb'), b'Fourth')
+        self.assertEqual(slf_file.getcontents('/carrot', 'rb'), b'Fourth')
+        self.assertEqual(slf_file.getcontents('/spam/parrot.txt', 'r'), 'Third')
+
+        self.assertEqual(slf_file.cache_info(), SlfCacheInfo(hits=1, misses=2, evictions=0, size=11, max_size=100))
+
+    def test_hits_are_not_read_again(self):
+        slf_bytes = create_test_slf_fs()
+        slf_file = SlfFS(slf_bytes, cache_size=100)
+        slf_file.getcontents('/carrot', 'rb')
+
+        with patch.object(slf_file, '_read') as read:
+            with slf_file.open('/carrot', 'rb') as f:
+                self.assertEqual(f.read(3), b'Fou')
+                self.assertTrue(f.getbuffer().readonly)
+
+        read.assert_not_called()
+
+    def test_reading_all_of_a_hit_does_not_copy(self):
+        slf_file = SlfFS(create_test_slf_fs(), cache_size=100)
+        data = slf_file.getcontents('/carrot', 'rb')
+
+        with slf_file.open('/carrot', 'rb') as f:
+            self.assertIs(f.read(), data)
+
+    def test_iter_members_and_read_many(self):
+        slf_file = SlfFS(create_test_slf_fs(), cache_size=100)
+        data = slf_file.getcontents('/carrot', 'rb')
+
+        self.assertEqual(slf_file.read_many(['/foo/bar.baz', '/carrot']), [b'First', b'Fourth'])
+        self.assertIs(slf_file.read_many(['/carrot'])[0], data)
+        self.assertEqual(slf_file.cache_info(), SlfCacheInfo(hits=2, misses=2, evictions=0, size=11, max_size=100))
+        with patch.object(slf_file, '_read') as read:
+            self.assertEqual(list(slf_file.iter_members(['/carrot', '/foo/bar.baz'], order=None)),
+                             [('/carrot', b'Fourth'), ('/foo/bar.baz', b'First')])
+        read.assert_not_called()
+
+    def test_least_recently_used_are_evicted(self):
+        slf_file = SlfFS(create_test_slf_fs(), cache_size=12)
+
+        slf_file.getcontents('/foo/bar.baz', 'rb')
+        slf_file.getcontents('/carrot', 'rb')
+        slf_file.getcontents('/foo/bar.baz', 'rb')
+        slf_file.getcontents('/spam/parrot.txt', 'rb')
+
+        self.assertEqual(slf_file.cache_info(), SlfCacheInfo(hits=1, misses=3, evictions=1, size=10, max_size=12))
+        slf_file.getcontents('/foo/bar.baz', 'rb')
+        self.assertEqual(slf_file.cache_info().hits, 2)
+        slf_file.getcontents('/carrot', 'rb')
+        self.assertEqual(slf_file.cache_info().misses, 4)
+
+    def test_files_larger_than_cache_are_not_cached(self):
+        slf_file = SlfFS(create_test_slf_fs(), cache_size=5)
+
+        self.assertEqual(slf_file.getcontents('/carrot', 'rb'), b'Fourth')
+        self.assertEqual(slf_file.getcontents('/foo/bar.baz', 'rb'), b'First')
+
+        self.assertEqual(slf_file.cache_info(), SlfCacheInfo(hits=0, misses=2, evictions=0, size=5, max_size=5))
+
+    def test_buffered_slf_fs(self):
+        slf_file = BufferedSlfFS(create_test_slf_fs(), cache_size=100)
+
+        slf_file.getcontents('/carrot', 'rb')
+        slf_file.getcontents('/carrot', 'rb')
+        slf_file.update()
+        self.assertEqual(slf_file.getcontents('/carrot', 'rb'), b'Fourth')
+
+        self.assertEqual(slf_file.cache_info(), SlfCacheInfo(hits=0, misses=1, evictions=0, size=6, max_size=100))
+
+
+class TestSlfFSMemoryMapped(unittest.TestCase):
+    def test_reading_from_file_like(self):
+        slf_file = SlfFS(create_test_slf_fs(), mmap=True)
+
+        self.assertTrue(slf_file.isfile('/spam/ham/parrot.txt'))
+        self.assertEqual(slf_file.open('/foo/bar.baz', 'rb').read(), b'First')
+        self.assertEqual(slf_file.open('/spam/ham/parrot.txt', 'rb').read(), b'Second')
+        self.assertEqual(slf_file.open('/carrot', 'r').read(), 'Fourth')
+
+    def test_reading_from_file(self):
+        with TemporaryDirectory() as directory:
+            slf_file = SlfFS(write_slf_file(directory, create_test_slf_fs()), mmap=True)
+            self.assertEqual(slf_file.library_name, 'SomeFile')
+            with slf_file.open('/spam/parrot.txt', 'rb') as f:
+                self.assertEqual(f.read(), b'Third')
+            with slf_file.open('/carrot', 'rb') as f:
+                self.assertEqual(bytes(f.getbuffer()), b'Fourth')
+                self.assertTrue(f.getbuffer().readonly)
+            slf_file.close()
+
+    def test_file_is_seekable_view(self):
+        slf_file = SlfFS(create_test_slf_fs(), mmap=True)
+        f = slf_file.open('/spam/ham/parrot.txt', 'rb')
+
+        self.assertEqual(f.read(2), b'Se')
+        self.assertEqual(f.tell(), 2)
+        f.seek(-3, os.SEEK_END)
+        self.assertEqual(f.read(), b'ond')
+        self.assertEqual(f.read(), b'')
+        f.seek(1)
+        buffer = bytearray(3)
+        self.assertEqual(f.readinto(buffer), 3)
+        self.assertEqual(buffer, b'eco')
+        f.close()
+        with self.assertRaises(ValueError):
+            f.read()
+
+    def test_open_missing_file(self):
+        slf_file = SlfFS(create_test_slf_fs(), mmap=True)
+
+        with self.assertRaises(ResourceNotFoundError):
+            slf_file.open('/foo/missing', 'rb')
+
+
+class TestSlfFSConcurrentReads(unittest.TestCase):
+    def test_thread_safe_meta(self):
+        self.assertFalse(SlfFS(create_test_slf_fs()).getmeta('thread_safe'))
+        self.assertTrue(SlfFS(create_test_slf_fs(), mmap=True).getmeta('thread_safe'))
+        with TemporaryDirectory() as directory:
+            slf_file = SlfFS(write_slf_file(directory, create_test_slf_fs()))
+            self.assertEqual(slf_file.getmeta('thread_safe'), hasattr(os, 'pread'))
+            slf_file.close()
+
+    def test_reading_from_multiple_threads(self):
+        expected = {
+            '/foo/bar.baz': b'First',
+            '/spam/ham/parrot.txt': b'Second',
+            '/spam/parrot.txt': b'Third',
+            '/carrot': b'Fourth',
+        }
+        paths = sorted(expected) * 250
+
+        with TemporaryDirectory() as directory:
+            slf_file = SlfFS(write_slf_file(directory, create_test_slf_fs()))
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(lambda p: slf_file.open(p, 'rb').read(), paths))
+            slf_file.close()
+
+        self.assertEqual(results, [expected[p] for p in paths])
+
+
+class TestSlfFSIndexCache(unittest.TestCase):
+    def assert_slf_fs_contents(self, slf_file):
+        time = strptime('19900101T010000UTC', "%Y%m%dT%H%M%S%Z")
+        self.assertEqual(slf_file.library_name, 'SomeFile')
+        self.assertEqual(set(slf_file.listdir('/spam')), {'parrot.txt', 'ham'})
+        self.assertEqual(slf_file.getinfo('/spam/ham/parrot.txt'), {'size': 6, 'modified_time': time})
+        self.assertEqual(slf_file.open('/carrot', 'rb').read(), b'Fourth')
+        self.assertEqual([e['state'] for e in slf_file.entries], [1, 1, 1, 1])
+
+    def test_index_is_cached(self):
+        with TemporaryDirectory() as directory:
+            path = write_slf_file(directory, create_test_slf_fs())
+            cache = os.path.join(directory, 'cache')
+
+            slf_file = SlfFS(path, index_cache=cache)
+            self.assert_slf_fs_contents(slf_file)
+            slf_file.close()
+            self.assertEqual(len(os.listdir(cache)), 1)
+
+            with patch.object(SlfFS, '_read_entries', side_effect=AssertionError('Entries not cached')):
+                slf_file = SlfFS(path, index_cache=cache)
+            self.assert_slf_fs_contents(slf_file)
+            slf_file.close()
+
+    def test_cache_of_changed_file_is_not_used(self):
+        with TemporaryDirectory() as directory:
+            path = write_slf_file(directory, create_slf_fs_with_directory_conflict())
+            cache = os.path.join(directory, 'cache')
+            SlfFS(path, index_cache=cache).close()
+
+            path = write_slf_file(directory, create_test_slf_fs())
+            slf_file = SlfFS(path, index_cache=cache)
+            self.assert_slf_fs_contents(slf_file)
+            slf_file.close()
+
+    def test_invalid_cache_is_not_used(self):
+        with TemporaryDirectory() as directory:
+            path = write_slf_file(directory, create_test_slf_fs())
+            cache = os.path.join(directory, 'cache')
+            SlfFS(path, index_cache=cache).close()
+            cache_file = os.path.join(cache, os.listdir(cache)[0])
+            with open(cache_file, 'wb') as f:
+                f.write(b'Invalid')
+
+            slf_file = SlfFS(path, index_cache=cache)
+            self.assert_slf_fs_contents(slf_file)
+            slf_file.close()
+
+
+class TestExtractSlf(unittest.TestCase):
+    def read_extracted(self, directory, *path):
+        with open(os.path.join(directory, *path), 'rb') as f:
+            return f.read()
+
+    def test_extracting_all_files(self):
+        for jobs in (1, 4):
+            with TemporaryDirectory() as directory:
+                slf_file = SlfFS(write_slf_file(directory, create_test_slf_fs()))
+                to_directory = os.path.join(directory, 'out')
+
+                extracted = extract_slf(slf_file, to_directory, jobs=jobs)
+                slf_file.close()
+
+                self.assertEqual(extracted, [
+                    os.path.join(to_directory, 'foo', 'bar.baz'),
+                    os.path.join(to_directory, 'spam', 'ham', 'parrot.txt'),
+                    os.path.join(to_directory, 'spam', 'parrot.txt'),
+                    os.path.join(to_directory, 'carrot'),
+                ])
+                self.assertEqual(self.read_extracted(to_directory, 'foo', 'bar.baz'), b'First')
+                self.assertEqual(self.read_extracted(to_directory, 'spam', 'ham', 'parrot.txt'), b'Second')
+                self.assertEqual(self.read_extracted(to_directory, 'spam', 'parrot.txt'), b'Third')
+                self.assertEqual(self.read_extracted(to_directory, 'carrot'), b'Fourth')
+
+    def test_extracting_from_file_name(self):
+        with TemporaryDirectory() as directory:
+            slf_path = write_slf_file(directory, create_test_slf_fs())
+            to_directory = os.path.join(directory, 'out')
+
+            extract_slf(slf_path, to_directory)
+
+            self.assertEqual(self.read_extracted(to_directory, 'carrot'), b'Fourth')
+
+    def test_one_thread_per_cpu_by_default(self):
+        with TemporaryDirectory() as directory:
+            with patch.object(slf_module, 'ThreadPoolExecutor', wraps=ThreadPoolExecutor) as executor:
+                extract_slf(SlfFS(create_test_slf_fs()), directory)
+
+        executor.assert_called_once_with(max_workers=os.cpu_count() or 1)
+
+    def test_extracting_from_file_like(self):
+        with TemporaryDirectory() as directory:
+            extract_slf(SlfFS(create_slf_fs_with_directory_conflict()), directory)
+
+            self.assertEqual(self.read_extracted(directory, 'foo', 'bar'), b'First')
+            self.assertEqual(self.read_extracted(directory, 'foo_DIRECTORY_CONFLICT'), b'Second')
+
+    def test_extracting_some_files(self):
+        with TemporaryDirectory() as directory:
+            extracted = extract_slf(SlfFS(create_test_slf_fs()), directory, paths=['carrot', '/spam/parrot.txt'])
+
+            self.assertEqual(extracted, [os.path.join(directory, 'spam', 'parrot.txt'),
+                                         os.path.join(directory, 'carrot')])
+            self.assertEqual(sorted(os.listdir(directory)), ['carrot', 'spam'])
+            self.assertEqual(os.listdir(os.path.join(directory, 'spam')), ['parrot.txt'])
+
+    def test_extracting_missing_file(self):
+        with TemporaryDirectory() as directory:
+            with self.assertRaises(ResourceNotFoundError):
+                extract_slf(SlfFS(create_test_slf_fs()), directory, paths=['/missing'])
+
+    def test_extracting_outside_of_destination(self):
+        time = strptime('19900101T010000UTC', "%Y%m%dT%H%M%S%Z")
+        header = SlfHeader(library_name='SomeFile', library_path='SomePath', number_of_entries=2, used=2, sort=1,
+                           version=1, contains_subdirectories=1)
+        data_offset = SlfHeader.get_size()
+        harmless_entry = SlfEntry(file_name='harmless.txt', offset=data_offset, length=5, state=1, time=time)
+        escaping_entry = SlfEntry(file_name='..\\..\\escaped.txt', offset=data_offset+5, length=7, state=1,
+                                  time=time)
+        slf_bytes = BytesIO(bytes(header) + b'First' + b'Escaped' + bytes(harmless_entry) + bytes(escaping_entry))
+
+        with TemporaryDirectory() as directory:
+            to_directory = os.path.join(directory, 'out', 'a')
+            with self.assertRaises(BackReferenceError):
+                extract_slf(SlfFS(slf_bytes), to_directory)
+
+            self.assertEqual(os.listdir(directory), [])
+
+
 class TestBufferedSlfFS(unittest.TestCase):
     def test_library_name(self):
         slf_file = BufferedSlfFS(create_test_slf_fs())
@@ -295,6 +978,22 @@ class TestBufferedSlfFS(unittest.TestCase):
 
         self.assertFalse(slf_file.exists('/spam'))
 
+    def test_removing_non_empty_directory_fails(self):
+        slf_file = BufferedSlfFS(create_test_slf_fs())
+
+        with self.assertRaises(DirectoryNotEmptyError):
+            slf_file.removedir('/spam')
+
+    def test_removing_directory_removes_empty_parents(self):
+        slf_file = BufferedSlfFS(create_test_slf_fs())
+
+        slf_file.remove('/spam/parrot.txt')
+        slf_file.removedir('/spam/ham', recursive=True, force=True)
+
+        self.assertFalse(slf_file.exists('/spam/ham/parrot.txt'))
+        self.assertFalse(slf_file.exists('/spam'))
+        self.assertEqual(set(slf_file.listdir('/')), {'foo', 'carrot'})
+
     def test_writing_to_disk_works(self):
         time = datetime.strptime('20160325T183100UTC', "%Y%m%dT%H%M%S%Z")
         slf_file = BufferedSlfFS(create_test_slf_fs())
@@ -318,3 +1017,173 @@ class TestBufferedSlfFS(unittest.TestCase):
         with BytesIO() as output:
             slf_file.save(output)
             self.assertEqual(output.getvalue(), expected_bytes)
+
+    def test_writing_to_real_file_works(self):
+        def change(slf_file):
+            slf_file.remove('/foo/bar.baz')
+            slf_file.makedir('/spam/ham', recursive=True)
+            with slf_file.open('/spam/ham/parrot.txt', 'wb') as f:
+                f.write(b'Changed')
+
+        slf_file = BufferedSlfFS(create_test_slf_fs())
+        change(slf_file)
+        with BytesIO() as output:
+            slf_file.save(output)
+            expected_bytes = output.getvalue()
+
+        with TemporaryDirectory() as directory:
+            output_path = os.path.join(directory, 'output.slf')
+            for mmap in (False, True):
+                slf_file = BufferedSlfFS(write_slf_file(directory, create_test_slf_fs()), mmap=mmap)
+                change(slf_file)
+                with open(output_path, 'wb') as output:
+                    slf_file.save(output)
+                slf_file.close()
+                with open(output_path, 'rb') as output:
+                    self.assertEqual(output.read(), expected_bytes)
+
+    def test_writing_keeps_names_of_directory_conflicts(self):
+        slf_file = BufferedSlfFS(create_slf_fs_with_directory_conflict())
+
+        with BytesIO() as output:
+            slf_file.save(output)
+            output.seek(0)
+            saved = SlfFS(output)
+            self.assertEqual(sorted(e['file_name'] for e in saved.entries), ['foo', 'foo\\bar'])
+            self.assertEqual(saved.open('/foo_DIRECTORY_CONFLICT', 'rb').read(), b'Second')
+
+    def test_writing_without_slf_file_works(self):
+        slf_file = BufferedSlfFS()
+        slf_file.makedir('/spam')
+        slf_file.setcontents('/spam/eggs', b'Eggs')
+
+        with BytesIO() as output:
+            slf_file.save(output)
+            output.seek(0)
+            saved = SlfFS(output)
+            self.assertEqual(saved.library_name, 'Custom')
+            self.assertEqual(saved.open('/spam/eggs', 'rb').read(), b'Eggs')
+
+    def test_writing_deduplicated(self):
+        slf_file = BufferedSlfFS(create_test_slf_fs())
+        slf_file.copy('/carrot', '/copy_of_carrot')
+        slf_file.setcontents('/eggs', b'Fourth')
+        slf_file.setcontents('/ham', b'Fifth')
+
+        with BytesIO() as output:
+            slf_file.save(output, deduplicate=True)
+            output.seek(0)
+            saved = SlfFS(output)
+            entries = dict((e['file_name'], e) for e in saved.entries)
+            self.assertEqual(len(output.getvalue()),
+                             SlfHeader.get_size() + len(b'FirstSecondThirdFourthFifth') + 7 * SlfEntry.get_size())
+            self.assertEqual(entries['copy_of_carrot']['offset'], entries['carrot']['offset'])
+            self.assertEqual(entries['eggs']['offset'], entries['carrot']['offset'])
+            self.assertNotEqual(entries['ham']['offset'], entries['spam\\parrot.txt']['offset'])
+            self.assertEqual(saved.getcontents('/eggs'), b'Fourth')
+            self.assertEqual(saved.getcontents('/ham'), b'Fifth')
+            self.assertEqual(saved.getcontents('/spam/parrot.txt'), b'Third')
+
+    def test_writing_without_deduplication_keeps_copies(self):
+        slf_file = BufferedSlfFS(create_test_slf_fs())
+        slf_file.copy('/carrot', '/copy_of_carrot')
+
+        with BytesIO() as output:
+            slf_file.save(output)
+            self.assertEqual(len(output.getvalue()),
+                             SlfHeader.get_size() + len(b'FirstSecondThirdFourthFourth') + 5 * SlfEntry.get_size())
+
+    def test_writing_deduplicated_hashes_only_files_of_equal_size(self):
+        slf_file = BufferedSlfFS(create_test_slf_fs())
+        slf_file.setcontents('/ham', b'Unique size')
+        hashed = []
+        get_member_key = slf_file._get_member_key
+
+        def counting_get_member_key(slf_entry, path):
+            hashed.append(path)
+            return get_member_key(slf_entry, path)
+
+        with patch.object(slf_file, '_get_member_key', counting_get_member_key):
+            with BytesIO() as output:
+                slf_file.save(output, deduplicate=True)
+
+        self.assertEqual(sorted(hashed), ['/carrot', '/foo/bar.baz', '/spam/ham/parrot.txt', '/spam/parrot.txt'])
+
+
+class TestBufferedSlfFSInPlace(unittest.TestCase):
+    @staticmethod
+    def change(slf_file):
+        slf_file.remove('/foo/bar.baz')
+        slf_file.makedir('/spam/ham', recursive=True)
+        slf_file.setcontents('/spam/ham/parrot.txt', b'Changed')
+        slf_file.setcontents('/eggs', b'New')
+
+    def assert_changed(self, slf_file):
+        self.assertFalse(slf_file.exists('/foo/bar.baz'))
+        self.assertEqual(slf_file.getcontents('/spam/ham/parrot.txt'), b'Changed')
+        self.assertEqual(slf_file.getcontents('/spam/parrot.txt'), b'Third')
+        self.assertEqual(slf_file.getcontents('/carrot'), b'Fourth')
+        self.assertEqual(slf_file.getcontents('/eggs'), b'New')
+
+    def test_update(self):
+        slf_bytes = create_test_slf_fs()
+        original_size = len(slf_bytes.getvalue())
+        slf_file = BufferedSlfFS(slf_bytes)
+
+        self.change(slf_file)
+        slf_file.update()
+
+        self.assert_changed(slf_file)
+        self.assertEqual(len(slf_bytes.getvalue()), original_size + len(b'ChangedNew') + 2 * SlfEntry.get_size())
+
+        slf_bytes.seek(0)
+        updated = SlfFS(slf_bytes)
+        self.assertEqual(updated.header['number_of_entries'], 6)
+        self.assertEqual(updated.header['used'], 4)
+        self.assertEqual([e['state'] for e in updated.entries], [0xFF, 0xFF, 1, 1, 0, 0])
+        self.assert_changed(updated)
+
+    def test_update_without_changes_keeps_file(self):
+        slf_bytes = create_test_slf_fs()
+        original = slf_bytes.getvalue()
+        slf_file = BufferedSlfFS(slf_bytes)
+
+        slf_file.update()
+
+        self.assertEqual(slf_bytes.getvalue(), original)
+
+    def test_compact(self):
+        slf_bytes = create_test_slf_fs()
+        slf_file = BufferedSlfFS(slf_bytes)
+        self.change(slf_file)
+        slf_file.update()
+
+        slf_file.compact()
+
+        self.assert_changed(slf_file)
+        slf_bytes.seek(0)
+        compacted = SlfFS(slf_bytes)
+        self.assertEqual(compacted.header['number_of_entries'], 4)
+        self.assertEqual(compacted.header['used'], 4)
+        self.assertEqual(len(slf_bytes.getvalue()),
+                         SlfHeader.get_size() + len(b'ThirdFourthChangedNew') + 4 * SlfEntry.get_size())
+
+    def test_update_and_compact_file(self):
+        with TemporaryDirectory() as directory:
+            path = write_slf_file(directory, create_test_slf_fs())
+            slf_file = BufferedSlfFS(path, mmap=True)
+
+            self.change(slf_file)
+            slf_file.update()
+            self.assert_changed(slf_file)
+            self.assertEqual(len(SlfFS(path).entries), 6)
+
+            slf_file.compact()
+            self.assert_changed(slf_file)
+            self.assertEqual(len(SlfFS(path).entries), 4)
+            self.assertEqual(os.listdir(directory), ['test.slf'])
+            slf_file.close()
+
+    def test_update_requires_slf_file(self):
+        with self.assertRaises(UnsupportedError):
+            BufferedSlfFS().update()
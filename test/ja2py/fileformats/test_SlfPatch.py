@@ -0,0 +1,119 @@
+import unittest
+from io import BytesIO
+from time import strptime
+from mock import patch
+from ja2py.fileformats import SlfFS, BufferedSlfFS, SlfPatchException, diff_slf, apply_slf_patch
+from ja2py.fileformats import SlfPatch
+
+from .test_SlfFS import create_test_slf_fs
+
+
+def save(buffered_slf_fs):
+    output = BytesIO()
+    buffered_slf_fs.save(output)
+    output.seek(0)
+    return SlfFS(output)
+
+
+def create_changed_slf_fs():
+    slf_file = BufferedSlfFS(create_test_slf_fs())
+    slf_file.remove('/foo/bar.baz')
+    slf_file.makedir('/spam')
+    slf_file.setcontents('/spam/parrot.txt', b'Changed')
+    slf_file.setcontents('/eggs', b'Added')
+    return save(slf_file)
+
+
+def diff(source, target):
+    patch_file = BytesIO()
+    summary = diff_slf(source, target, patch_file)
+    patch_file.seek(0)
+    return patch_file, summary
+
+
+def apply(source, patch_file):
+    output = BytesIO()
+    apply_slf_patch(source, patch_file, output)
+    output.seek(0)
+    return SlfFS(output)
+
+
+class TestSlfPatch(unittest.TestCase):
+    def test_diff_and_apply(self):
+        source = SlfFS(create_test_slf_fs())
+        target = create_changed_slf_fs()
+
+        patch_file, summary = diff(source, target)
+        patched = apply(source, patch_file)
+
+        self.assertEqual(summary, {'added': 1, 'changed': 1, 'removed': 1, 'unchanged': 2})
+        self.assertEqual([(e['file_name'], e['length'], e['time']) for e in patched.entries],
+                         [(e['file_name'], e['length'], e['time']) for e in target.entries])
+        self.assertFalse(patched.exists('/foo/bar.baz'))
+        self.assertEqual(patched.getcontents('/spam/ham/parrot.txt'), b'Second')
+        self.assertEqual(patched.getcontents('/spam/parrot.txt'), b'Changed')
+        self.assertEqual(patched.getcontents('/carrot'), b'Fourth')
+        self.assertEqual(patched.getcontents('/eggs'), b'Added')
+        self.assertEqual(patched.library_name, target.library_name)
+
+    def test_patch_contains_only_changed_contents(self):
+        source = SlfFS(create_test_slf_fs())
+        patch_file, _ = diff(source, create_changed_slf_fs())
+
+        contents = patch_file.getvalue()
+        self.assertIn(b'Changed', contents)
+        self.assertIn(b'Added', contents)
+        self.assertNotIn(b'Second', contents)
+        self.assertNotIn(b'Fourth', contents)
+
+    def test_diff_of_equal_slf_files_compares_only_entries(self):
+        source = SlfFS(create_test_slf_fs())
+        target = SlfFS(create_test_slf_fs())
+
+        with patch.object(SlfPatch, '_has_same_contents') as has_same_contents:
+            patch_file, summary = diff(source, target)
+
+        has_same_contents.assert_not_called()
+        self.assertEqual(summary, {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 4})
+        self.assertEqual(apply(source, patch_file).getcontents('/spam/parrot.txt'), b'Third')
+
+    def test_diff_compares_contents_if_only_time_differs(self):
+        time = strptime('20200101T010000UTC', "%Y%m%dT%H%M%S%Z")
+        slf_file = BufferedSlfFS(create_test_slf_fs())
+        slf_file.makedir('/spam')
+        slf_file.setcontents('/carrot', b'Fourth')
+        slf_file.setcontents('/spam/parrot.txt', b'Fifth')
+        slf_file.settimes('/carrot', modified_time=time)
+        slf_file.settimes('/spam/parrot.txt', modified_time=time)
+        source = SlfFS(create_test_slf_fs())
+
+        patch_file, summary = diff(source, save(slf_file))
+        patched = apply(source, patch_file)
+
+        self.assertEqual(summary, {'added': 0, 'changed': 1, 'removed': 0, 'unchanged': 3})
+        self.assertEqual(patched.getcontents('/carrot'), b'Fourth')
+        self.assertEqual(patched.getinfo('/carrot')['modified_time'], time)
+        self.assertEqual(patched.getcontents('/spam/parrot.txt'), b'Fifth')
+
+    def test_apply_to_wrong_source(self):
+        patch_file, _ = diff(SlfFS(create_test_slf_fs()), create_changed_slf_fs())
+        source = BufferedSlfFS(create_test_slf_fs())
+        source.setcontents('/carrot', b'Other length')
+
+        with self.assertRaises(SlfPatchException):
+            apply(save(source), patch_file)
+
+    def test_apply_to_source_with_other_times(self):
+        patch_file, _ = diff(SlfFS(create_test_slf_fs()), create_changed_slf_fs())
+        source = BufferedSlfFS(create_test_slf_fs())
+        source.setcontents('/carrot', b'Fifth!')
+        source.settimes('/carrot', modified_time=strptime('20200101T010000UTC', "%Y%m%dT%H%M%S%Z"))
+
+        with self.assertRaises(SlfPatchException):
+            apply(save(source), patch_file)
+
+    def test_apply_invalid_patch(self):
+        with self.assertRaises(SlfPatchException):
+            apply(SlfFS(create_test_slf_fs()), BytesIO(b'Not a patch at all'))
+        with self.assertRaises(SlfPatchException):
+            apply(SlfFS(create_test_slf_fs()), BytesIO(b'SLFPATCH'))
@@ -0,0 +1,109 @@
+import unittest
+from io import BytesIO
+from tempfile import TemporaryDirectory
+from time import strptime
+from ja2py.fileformats import SlfEntry, SlfHeader, SlfFS, BufferedSlfFS, SlfProblem, verify_slf
+
+from .fixtures import create_8_bit_sti, create_16_bit_sti
+from .test_SlfFS import create_test_slf_fs, write_slf_file
+
+
+def create_slf_fs(entries, used=None, data=b'FirstSecondThirdFourth', number_of_entries=None):
+    time = strptime('19900101T010000UTC', "%Y%m%dT%H%M%S%Z")
+    header = SlfHeader(library_name='SomeFile', library_path='SomePath',
+                       number_of_entries=len(entries) if number_of_entries is None else number_of_entries,
+                       used=len(entries) if used is None else used, sort=1, version=1, contains_subdirectories=0)
+    data_offset = SlfHeader.get_size()
+    slf_entries = list(SlfEntry(file_name=name, offset=data_offset + offset, length=length, state=0, time=time)
+                       for name, offset, length in entries)
+    return SlfFS(BytesIO(bytes(header) + data + b''.join(bytes(e) for e in slf_entries)))
+
+
+def create_slf_with_images():
+    slf_file = BufferedSlfFS()
+    slf_file.setcontents('/8bit.sti', create_8_bit_sti().getvalue())
+    slf_file.setcontents('/16bit.sti', create_16_bit_sti().getvalue())
+    slf_file.setcontents('/broken.sti', b'STCI' + 60 * b'\x00')
+    slf_file.setcontents('/truncated.sti', create_8_bit_sti().getvalue()[:70])
+    slf_file.setcontents('/tiles.gap', b'\x01\x00\x00\x00\x02\x00\x00\x00')
+    slf_file.setcontents('/broken.gap', b'\x01\x00\x00')
+    slf_file.setcontents('/readme.txt', b'Not decoded')
+    output = BytesIO()
+    slf_file.save(output)
+    output.seek(0)
+    return output
+
+
+class TestVerifySlf(unittest.TestCase):
+    def test_valid_slf(self):
+        verification = verify_slf(SlfFS(create_test_slf_fs()))
+
+        self.assertEqual(verification.problems, [])
+
+    def test_used_mismatch(self):
+        verification = verify_slf(create_slf_fs([('first', 0, 5), ('second', 5, 6)], used=1))
+
+        self.assertEqual(verification.problems, [SlfProblem(None, 'Header says 1 entries are used, but 2 are')])
+
+    def test_negative_number_of_entries(self):
+        with TemporaryDirectory() as directory:
+            slf_fs = create_slf_fs([], number_of_entries=-3, used=0)
+            path = write_slf_file(directory, slf_fs.file)
+
+            self.assertEqual(verify_slf(slf_fs).problems, [SlfProblem(None, 'Header says there are -3 entries')])
+            self.assertEqual(verify_slf(path).problems, [SlfProblem(None, 'Header says there are -3 entries')])
+
+    def test_more_used_than_entries(self):
+        verification = verify_slf(create_slf_fs([('first', 0, 5)], used=2, number_of_entries=1))
+
+        self.assertEqual(verification.problems, [SlfProblem(None, 'Header says 2 entries are used, but there are only 1'),
+                                                 SlfProblem(None, 'Header says 2 entries are used, but 1 are')])
+
+    def test_entries_out_of_bounds(self):
+        verification = verify_slf(create_slf_fs([('first', 0, 5), ('second', 20, 6), ('third', -10, 5)]))
+
+        self.assertEqual([p.file_name for p in verification.problems], ['third', 'second'])
+
+    def test_overlapping_entries(self):
+        verification = verify_slf(create_slf_fs([('second', 5, 6), ('first', 0, 6), ('third', 11, 5),
+                                                 ('inside', 12, 2)]))
+
+        self.assertEqual([p.file_name for p in verification.problems], ['second', 'inside'])
+
+    def test_shared_and_empty_entries_are_allowed(self):
+        verification = verify_slf(create_slf_fs([('first', 0, 5), ('copy', 0, 5), ('empty', 2, 0), ('second', 5, 6)]))
+
+        self.assertEqual(verification.problems, [])
+
+    def test_deduplicated_slf(self):
+        slf_file = BufferedSlfFS(create_test_slf_fs())
+        slf_file.copy('/carrot', '/copy')
+        output = BytesIO()
+        slf_file.save(output, deduplicate=True)
+        output.seek(0)
+
+        self.assertEqual(verify_slf(SlfFS(output)).problems, [])
+
+    def test_unreadable_slf(self):
+        with TemporaryDirectory() as directory:
+            path = write_slf_file(directory, BytesIO(b'Too short'))
+
+            verification = verify_slf(path)
+
+        self.assertEqual(len(verification.problems), 1)
+
+    def test_decoding(self):
+        expected_problems = ['broken.gap', 'broken.sti', 'truncated.sti']
+
+        verification = verify_slf(SlfFS(create_slf_with_images()), decode=True)
+
+        self.assertEqual(sorted(p.file_name for p in verification.problems), expected_problems)
+        self.assertEqual(verification.number_of_decoded, 6)
+
+        with TemporaryDirectory() as directory:
+            path = write_slf_file(directory, create_slf_with_images())
+            for jobs in (1, 2):
+                verification = verify_slf(path, decode=True, jobs=jobs)
+
+                self.assertEqual(sorted(p.file_name for p in verification.problems), expected_problems)
+                self.assertEqual(verification.number_of_decoded, 6)
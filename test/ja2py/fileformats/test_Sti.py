@@ -4,7 +4,8 @@ from .fixtures import *
 from ja2py.fileformats import Sti16BitHeader, Sti8BitHeader, StiHeader, StiSubImageHeader, AuxObjectData,\
                               is_16bit_sti, is_8bit_sti, load_16bit_sti, load_8bit_sti, save_16bit_sti, save_8bit_sti
 from ja2py.content import Image16Bit, Images8Bit, SubImage8Bit
-from ja2py.fileformats.Sti import StiImagePlugin, StiImageEncoder, validate_spec, _color_components
+from ja2py.fileformats.Sti import StiImagePlugin, StiImageDecoder, StiImageEncoder, validate_spec, _color_components, \
+                                  _load_raw_sub_image
 
 
 class TestSti16BitHeader(unittest.TestCase):
@@ -368,6 +369,15 @@ class TestLoad8BitSti(unittest.TestCase):
         img = load_8bit_sti(create_8_bit_multi_image_sti())
         self.assertEqual(img.images[0].image.convert('RGB').getpixel((0, 0)), (1, 2, 3))
 
+    def test_sub_image_with_too_much_data(self):
+        img = _load_raw_sub_image(BytesIO(b'\x03\x01\x02\x03'), [0] * 768, {'length': 4, 'width': 2, 'height': 1})
+
+        self.assertEqual(img.tobytes(), b'\x01\x02')
+
+    def test_sub_image_with_not_enough_data(self):
+        with self.assertRaisesRegex(ValueError, 'not enough image data'):
+            _load_raw_sub_image(BytesIO(b'\x01\x01'), [0] * 768, {'length': 2, 'width': 2, 'height': 1})
+
     def test_aux_object_data(self):
         img = load_8bit_sti(create_8_bit_animated_sti())
 
@@ -750,6 +760,42 @@ class TestStiImagePlugin(unittest.TestCase):
             self.assertEqual(list(img.getdata()), list(original.getdata()))
 
 
+class TestStiImageDecoder(unittest.TestCase):
+    def decode_etrle(self, data, size, chunk_size):
+        img = Image.new('P', size, 255)
+        decoder = StiImageDecoder('P', 'etrle', 0, len(data))
+        decoder.setimage(img.im, (0, 0) + size)
+        for i in range(0, len(data), chunk_size):
+            consumed, status = decoder.decode(data[i:i + chunk_size])
+            if consumed < 0:
+                break
+            self.assertEqual((consumed, status), (chunk_size, 0))
+        return img, (consumed, status)
+
+    def test_etrle_chunks(self):
+        data = b'\x02\x01\x02\x81\x00' + b'\x83\x00' + b'\x01\x03\x82\x00'
+
+        for chunk_size in range(1, len(data) + 1):
+            img, result = self.decode_etrle(data, (3, 3), chunk_size)
+
+            self.assertEqual(result, (-1, 1))
+            self.assertEqual(list(img.getdata()), [1, 2, 0, 0, 0, 0, 3, 0, 0])
+
+    def test_etrle_rows_are_decoded_as_they_arrive(self):
+        img = Image.new('P', (2, 2), 255)
+        decoder = StiImageDecoder('P', 'etrle', 0, 7)
+        decoder.setimage(img.im, (0, 0, 2, 2))
+
+        self.assertEqual(decoder.decode(b'\x02\x01\x02\x00'), (4, 0))
+        self.assertEqual(list(img.getdata()), [1, 2, 255, 255])
+        self.assertEqual(decoder.decode(b'\x82\x00\x00'), (-1, 1))
+        self.assertEqual(list(img.getdata()), [1, 2, 0, 0])
+
+    def test_etrle_not_enough_image_data(self):
+        with self.assertRaises(ValueError):
+            self.decode_etrle(b'\x02\x01\x02\x00', (2, 2), 4)
+
+
 class TestStiImageEncoder(unittest.TestCase):
     def test_colors_official_spec(self):
         data = [(0x00,0x00,0x00), (0xff,0xff,0xff),